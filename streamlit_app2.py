@@ -2,10 +2,15 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import geopandas as gpd
 import math
 from io import BytesIO
+from PIL import Image
 import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 # Custom CSS for the dashboard
 st.markdown("""
@@ -40,137 +45,127 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Let matplotlib drop near-collinear vertices when drawing detailed chiefdom boundaries
+plt.rcParams["path.simplify"] = True
+plt.rcParams["path.simplify_threshold"] = 1.0
+
+# QR code field patterns, compiled once
+_DISTRICT_RE = re.compile(r"District:\s*([^\n]+)")
+_CHIEFDOM_RE = re.compile(r"Chiefdom:\s*([^\n]+)")
+
+# Mapping between GPS data chiefdom names and shapefile FIRST_CHIE names
+_CHIEFDOM_MAPPING = {
+    # BO District mappings
+    "Bo City": "BO TOWN",
+    "Badjia": "BADJIA",
+    "Bargbo": "BAGBO",
+    "Bagbwe": "BAGBWE(BAGBE)",
+    "Baoma": "BOAMA",
+    "Bongor": "BONGOR",
+    "Bumpeh": "BUMPE NGAO",
+    "Gbo": "GBO",
+    "Jaiama": "JAIAMA",
+    "Kakua": "KAKUA",
+    "Komboya": "KOMBOYA",
+    "Lugbu": "LUGBU",
+    "Niawa Lenga": "NIAWA LENGA",
+    "Selenga": "SELENGA",
+    "Tinkoko": "TIKONKO",
+    "Valunia": "VALUNIA",
+    "Wonde": "WONDE",
+    
+    # BOMBALI District mappings
+    "Biriwa": "BIRIWA",
+    "Bombali Sebora": "BOMBALI SEBORA",
+    "Bombali Serry": "BOMBALI SIARI",
+    "Gbanti (Bombali)": "GBANTI",
+    "Gbanti": "GBANTI",
+    "Gbendembu": "GBENDEMBU",
+    "Kamaranka": "KAMARANKA",
+    "Magbaimba Ndohahun": "MAGBAIMBA NDORWAHUN",
+    "Makarie": "MAKARI",
+    "Mara": "MARA",
+    "Ngowahun": "N'GOWAHUN",
+    "Paki Masabong": "PAKI MASABONG",
+    "Safroko Limba": "SAFROKO LIMBA",
+    "Makeni City": "MAKENI CITY",
+}
+_CHIEFDOM_MAPPING_UPPER = {key.upper(): value for key, value in _CHIEFDOM_MAPPING.items()}
+
 def create_chiefdom_mapping():
     """Create mapping between GPS data chiefdom names and shapefile FIRST_CHIE names"""
-    chiefdom_mapping = {
-        # BO District mappings
-        "Bo City": "BO TOWN",
-        "Badjia": "BADJIA",
-        "Bargbo": "BAGBO",
-        "Bagbwe": "BAGBWE(BAGBE)",
-        "Baoma": "BOAMA",
-        "Bongor": "BONGOR",
-        "Bumpeh": "BUMPE NGAO",
-        "Gbo": "GBO",
-        "Jaiama": "JAIAMA",
-        "Kakua": "KAKUA",
-        "Komboya": "KOMBOYA",
-        "Lugbu": "LUGBU",
-        "Niawa Lenga": "NIAWA LENGA",
-        "Selenga": "SELENGA",
-        "Tinkoko": "TIKONKO",
-        "Valunia": "VALUNIA",
-        "Wonde": "WONDE",
-        
-        # BOMBALI District mappings
-        "Biriwa": "BIRIWA",
-        "Bombali Sebora": "BOMBALI SEBORA",
-        "Bombali Serry": "BOMBALI SIARI",
-        "Gbanti (Bombali)": "GBANTI",
-        "Gbanti": "GBANTI",
-        "Gbendembu": "GBENDEMBU",
-        "Kamaranka": "KAMARANKA",
-        "Magbaimba Ndohahun": "MAGBAIMBA NDORWAHUN",
-        "Makarie": "MAKARI",
-        "Mara": "MARA",
-        "Ngowahun": "N'GOWAHUN",
-        "Paki Masabong": "PAKI MASABONG",
-        "Safroko Limba": "SAFROKO LIMBA",
-        "Makeni City": "MAKENI CITY",
-    }
-    return chiefdom_mapping
+    return _CHIEFDOM_MAPPING
 
-def map_chiefdom_name(chiefdom_name, mapping):
-    """Map chiefdom name from GPS data to shapefile name"""
-    if pd.isna(chiefdom_name):
-        return None
-    
-    chiefdom_name = str(chiefdom_name).strip()
-    
-    # Direct match
-    if chiefdom_name in mapping:
-        return mapping[chiefdom_name]
+def map_chiefdom_names(chiefdom_names, upper_mapping=_CHIEFDOM_MAPPING_UPPER):
+    """Map a column of chiefdom names from GPS data to shapefile names"""
+    names = chiefdom_names.str.strip()
+    upper_names = names.str.upper()
     
-    # Case-insensitive match
-    for key, value in mapping.items():
-        if key.upper() == chiefdom_name.upper():
-            return value
+    # Direct and case-insensitive match
+    mapped = upper_names.map(upper_mapping)
     
-    # Partial match (contains)
-    for key, value in mapping.items():
-        if key.upper() in chiefdom_name.upper() or chiefdom_name.upper() in key.upper():
-            return value
+    # Partial match (contains) - only checked once per distinct unmatched name
+    partial_matches = {}
+    for upper_name in upper_names[mapped.isna() & names.notna()].unique():
+        for key, value in upper_mapping.items():
+            if key in upper_name or upper_name in key:
+                partial_matches[upper_name] = value
+                break
+    mapped = mapped.fillna(upper_names.map(partial_matches))
     
     # Return original if no mapping found
-    return chiefdom_name
-
-def calculate_itn_totals_per_row(df, row_idx):
-    """Calculate ITN totals for a specific row - CONSISTENT METHOD"""
-    boys_total = 0
-    girls_total = 0
-    left_total = 0
-    
-    # Calculate boys and girls ITNs across all classes
-    for class_num in range(1, 6):
-        boys_col = f"How many boys in Class {class_num} received ITNs?"
-        girls_col = f"How many girls in Class {class_num} received ITNs?"
-        
-        if boys_col in df.columns:
-            boys_val = df[boys_col].iloc[row_idx]
-            if pd.notna(boys_val):
-                boys_total += int(boys_val)
-        
-        if girls_col in df.columns:
-            girls_val = df[girls_col].iloc[row_idx]
-            if pd.notna(girls_val):
-                girls_total += int(girls_val)
-    
+    return mapped.fillna(names)
+
+def calculate_itn_totals_per_row(df):
+    """Calculate enrollment and ITN totals for every row at once - CONSISTENT METHOD"""
+    enrollment_cols = [f"How many pupils are enrolled in Class {class_num}?" for class_num in range(1, 6)]
+    boys_cols = [f"How many boys in Class {class_num} received ITNs?" for class_num in range(1, 6)]
+    girls_cols = [f"How many girls in Class {class_num} received ITNs?" for class_num in range(1, 6)]
     # ITNs left at school (single value per school) - FIXED: Only counted once per school
-    left_col = "ITNs left at the school for pupils who were absent."
-    if left_col in df.columns:
-        left_val = df[left_col].iloc[row_idx]
-        if pd.notna(left_val):
-            left_total = int(left_val)
+    left_cols = ["ITNs left at the school for pupils who were absent."]
+    
+    # Pull every count column present in the file into one 2-D array (missing values count as 0)
+    column_groups = [[col for col in cols if col in df.columns]
+                     for cols in (enrollment_cols, boys_cols, girls_cols, left_cols)]
+    counts = df[sum(column_groups, [])].fillna(0).to_numpy(dtype=np.int64)
+    
+    # Row totals for each group of columns, taken from consecutive slices of the array
+    group_ends = np.cumsum([len(cols) for cols in column_groups])
+    enrollment_total, boys_total, girls_total, left_total = (
+        counts[:, end - len(cols):end].sum(axis=1) for cols, end in zip(column_groups, group_ends)
+    )
     
     # Total ITNs = Boys + Girls + Left at School
     total_distributed = boys_total + girls_total + left_total
     
     return {
+        'enrollment': enrollment_total,
         'boys': boys_total,
         'girls': girls_total, 
         'left': left_total,
         'total_distributed': total_distributed
     }
 
+@st.cache_data
 def calculate_itn_totals_for_dataframe(df):
     """Calculate ITN totals for entire dataframe - CONSISTENT METHOD with detailed breakdown"""
-    total_boys = 0
-    total_girls = 0
-    total_left = 0
-    
-    # Calculate boys and girls ITNs across all classes with detailed tracking
-    boys_by_class = {}
-    girls_by_class = {}
-    
-    for class_num in range(1, 6):
-        boys_col = f"How many boys in Class {class_num} received ITNs?"
-        girls_col = f"How many girls in Class {class_num} received ITNs?"
-        
-        if boys_col in df.columns:
-            class_boys = int(df[boys_col].fillna(0).sum())
-            boys_by_class[f"Class {class_num}"] = class_boys
-            total_boys += class_boys
-        
-        if girls_col in df.columns:
-            class_girls = int(df[girls_col].fillna(0).sum())
-            girls_by_class[f"Class {class_num}"] = class_girls
-            total_girls += class_girls
-    
+    boys_cols = {f"Class {class_num}": f"How many boys in Class {class_num} received ITNs?" for class_num in range(1, 6)}
+    girls_cols = {f"Class {class_num}": f"How many girls in Class {class_num} received ITNs?" for class_num in range(1, 6)}
     # FIXED: ITNs left at school - this is per school, not per class
     # Only sum this once across all schools, not multiplied by classes
     left_col = "ITNs left at the school for pupils who were absent."
-    if left_col in df.columns:
-        total_left = int(df[left_col].fillna(0).sum())
+    
+    # Sum every ITN column present in the file in a single pass
+    itn_cols = [col for col in [*boys_cols.values(), *girls_cols.values(), left_col] if col in df.columns]
+    column_totals = df[itn_cols].fillna(0).sum()
+    
+    # Calculate boys and girls ITNs across all classes with detailed tracking
+    boys_by_class = {class_name: int(column_totals[col]) for class_name, col in boys_cols.items() if col in column_totals}
+    girls_by_class = {class_name: int(column_totals[col]) for class_name, col in girls_cols.items() if col in column_totals}
+    
+    total_boys = sum(boys_by_class.values())
+    total_girls = sum(girls_by_class.values())
+    total_left = int(column_totals[left_col]) if left_col in column_totals else 0
     
     # Total ITNs = Boys + Girls + Left at School
     total_distributed = total_boys + total_girls + total_left
@@ -184,222 +179,151 @@ def calculate_itn_totals_for_dataframe(df):
         'girls_by_class': girls_by_class
     }
 
+@st.cache_data
 def extract_itn_data_from_excel(df):
     """Extract ITN coverage data from the Excel file using CONSISTENT calculation"""
-    # Create empty lists to store extracted data
-    districts, chiefdoms, total_enrollment, distributed_itns = [], [], [], []
-    
-    # Get chiefdom mapping
-    chiefdom_mapping = create_chiefdom_mapping()
-    
-    # Process each row in the "Scan QR code" column
-    for idx, qr_text in enumerate(df["Scan QR code"]):
-        if pd.isna(qr_text):
-            districts.append(None)
-            chiefdoms.append(None)
-            total_enrollment.append(0)
-            distributed_itns.append(0)
-            continue
-            
-        # Extract values using regex patterns
-        district_match = re.search(r"District:\s*([^\n]+)", str(qr_text))
-        district = district_match.group(1).strip() if district_match else None
-        districts.append(district)
-        
-        chiefdom_match = re.search(r"Chiefdom:\s*([^\n]+)", str(qr_text))
-        original_chiefdom = chiefdom_match.group(1).strip() if chiefdom_match else None
-        
-        # Map chiefdom name to match shapefile
-        mapped_chiefdom = map_chiefdom_name(original_chiefdom, chiefdom_mapping)
-        chiefdoms.append(mapped_chiefdom)
-        
-        # Calculate total enrollment (sum of all class enrollments)
-        enrollment_total = 0
-        for class_num in range(1, 6):  # Classes 1-5
-            enrollment_col = f"How many pupils are enrolled in Class {class_num}?"
-            if enrollment_col in df.columns:
-                class_enrollment = df[enrollment_col].iloc[idx]
-                if pd.notna(class_enrollment):
-                    enrollment_total += int(class_enrollment)
-        
-        total_enrollment.append(enrollment_total)
-        
-        # FIXED: Calculate ITN totals using consistent method
-        itn_data = calculate_itn_totals_per_row(df, idx)
-        distributed_itns.append(itn_data['total_distributed'])
+    # Rows without a QR code carry no district/chiefdom and count as 0
+    qr_codes = df["Scan QR code"]
+    has_qr = qr_codes.notna().to_numpy()
+    qr_text = qr_codes.astype(str)
+    
+    # Extract values using regex patterns
+    districts = qr_text.str.extract(_DISTRICT_RE, expand=False).str.strip().where(has_qr)
+    original_chiefdoms = qr_text.str.extract(_CHIEFDOM_RE, expand=False).str.strip().where(has_qr)
+    
+    # Map chiefdom names to match shapefile
+    chiefdoms = map_chiefdom_names(original_chiefdoms)
+    
+    # FIXED: Calculate enrollment and ITN totals using consistent method
+    itn_data = calculate_itn_totals_per_row(df)
+    # Per-school counts fit comfortably in int32, halving the column width
+    total_enrollment = np.where(has_qr, itn_data['enrollment'], 0).astype(np.int32)
+    distributed_itns = np.where(has_qr, itn_data['total_distributed'], 0).astype(np.int32)
     
     # Create a new DataFrame with extracted values
     itn_df = pd.DataFrame({
-        "District": districts,
-        "Chiefdom": chiefdoms,
+        "District": districts.to_numpy(),
+        "Chiefdom": chiefdoms.to_numpy(),
         "Total_Enrollment": total_enrollment,
         "Distributed_ITNs": distributed_itns
     })
     
+    # Categorical names so filters and groupbys compare integer codes, not strings;
+    # categories are created in name order, so sorted groupbys need no string sort
+    itn_df["District"] = itn_df["District"].astype("category")
+    itn_df["Chiefdom"] = itn_df["Chiefdom"].astype("category").cat.as_ordered()
+    itn_df["District_upper"] = itn_df["District"].str.upper().astype("category")
+    
     return itn_df
 
 def generate_summaries(df):
     """Generate District, Chiefdom, and Gender summaries - CONSISTENT WITH FIRST DOCUMENT"""
     summaries = {}
     
-    # Overall Summary
-    overall_summary = {
-        'total_schools': len(df),
-        'total_districts': len(df['District'].dropna().unique()) if 'District' in df.columns else 0,
-        'total_chiefdoms': len(df['Chiefdom'].dropna().unique()) if 'Chiefdom' in df.columns else 0,
-        'total_boys': 0,
-        'total_girls': 0,
-        'total_enrollment': 0,
-        'total_itn': 0,
-        'total_left': 0
-    }
-    
-    # Calculate totals using the correct columns
-    for class_num in range(1, 6):
-        # Total enrollment from "Number of enrollments in class X"
-        enrollment_col = f"How many pupils are enrolled in Class {class_num}?"
-        if enrollment_col in df.columns:
-            overall_summary['total_enrollment'] += int(df[enrollment_col].fillna(0).sum())
-        
-        # Boys and girls for gender analysis AND ITN calculation
-        boys_col = f"How many boys in Class {class_num} received ITNs?"
-        girls_col = f"How many girls in Class {class_num} received ITNs?"
-        
-        if boys_col in df.columns:
-            overall_summary['total_boys'] += int(df[boys_col].fillna(0).sum())
-        if girls_col in df.columns:
-            overall_summary['total_girls'] += int(df[girls_col].fillna(0).sum())
-    
-    # FIXED: ITNs left at school - this should be per school, not per class
+    enrollment_cols = [f"How many pupils are enrolled in Class {class_num}?" for class_num in range(1, 6)]
+    boys_cols = [f"How many boys in Class {class_num} received ITNs?" for class_num in range(1, 6)]
+    girls_cols = [f"How many girls in Class {class_num} received ITNs?" for class_num in range(1, 6)]
     itn_left_col = "ITNs left at the school for pupils who were absent."
-    if itn_left_col in df.columns:
-        overall_summary['total_left'] += int(df[itn_left_col].fillna(0).sum())
-    
-    # Total ITNs = boys + girls + left (all ITNs distributed or allocated)
-    overall_summary['total_itn'] = overall_summary['total_boys'] + overall_summary['total_girls'] + overall_summary['total_left']
     
-    # Calculate coverage
-    overall_summary['coverage'] = (overall_summary['total_itn'] / overall_summary['total_enrollment'] * 100) if overall_summary['total_enrollment'] > 0 else 0
-    overall_summary['itn_remaining'] = overall_summary['total_enrollment'] - overall_summary['total_itn']
+    # Per-school totals across classes, summed once and then rolled up by group
+    school_totals = pd.DataFrame({
+        'District': df['District'] if 'District' in df.columns else None,
+        'Chiefdom': df['Chiefdom'] if 'Chiefdom' in df.columns else None,
+        'schools': 1,
+        'boys': df[[col for col in boys_cols if col in df.columns]].fillna(0).sum(axis=1),
+        'girls': df[[col for col in girls_cols if col in df.columns]].fillna(0).sum(axis=1),
+        'enrollment': df[[col for col in enrollment_cols if col in df.columns]].fillna(0).sum(axis=1),
+        # FIXED: ITNs left at school - this should be per school, not per class
+        'left': df[itn_left_col].fillna(0) if itn_left_col in df.columns else 0
+    }, index=df.index)
+    
+    count_cols = ['schools', 'boys', 'girls', 'enrollment', 'left']
+    chiefdom_totals = school_totals.groupby(['District', 'Chiefdom'], observed=True, sort=False, dropna=False)[count_cols].sum()
+    
+    def add_coverage(totals):
+        """Add ITN total, coverage and remaining ITNs to a frame of summed counts"""
+        totals = totals.astype(np.int64)
+        # Total ITNs = boys + girls + left (all ITNs distributed or allocated)
+        totals['itn'] = totals['boys'] + totals['girls'] + totals['left']
+        totals['coverage'] = (totals['itn'] / totals['enrollment'] * 100).where(totals['enrollment'] > 0, 0)
+        totals['itn_remaining'] = totals['enrollment'] - totals['itn']
+        return totals
     
-    summaries['overall'] = overall_summary
+    # Overall Summary
+    overall = add_coverage(chiefdom_totals.sum().to_frame().T).iloc[0]
+    summaries['overall'] = {
+        'total_schools': int(overall['schools']),
+        'total_districts': school_totals['District'].nunique(),
+        'total_chiefdoms': school_totals['Chiefdom'].nunique(),
+        'total_boys': int(overall['boys']),
+        'total_girls': int(overall['girls']),
+        'total_enrollment': int(overall['enrollment']),
+        'total_itn': int(overall['itn']),
+        'total_left': int(overall['left']),
+        'coverage': float(overall['coverage']),
+        'itn_remaining': int(overall['itn_remaining'])
+    }
     
     # District Summary
-    district_summary = []
-    for district in df['District'].dropna().unique():
-        district_data = df[df['District'] == district]
-        district_stats = {
-            'district': district,
-            'schools': len(district_data),
-            'chiefdoms': len(district_data['Chiefdom'].dropna().unique()),
-            'boys': 0,
-            'girls': 0,
-            'enrollment': 0,
-            'itn': 0,
-            'left': 0
-        }
-        
-        for class_num in range(1, 6):
-            # Total enrollment from "Number of enrollments in class X"
-            enrollment_col = f"How many pupils are enrolled in Class {class_num}?"
-            if enrollment_col in district_data.columns:
-                district_stats['enrollment'] += int(district_data[enrollment_col].fillna(0).sum())
-            
-            # Boys and girls for gender analysis AND ITN calculation
-            boys_col = f"How many boys in Class {class_num} received ITNs?"
-            girls_col = f"How many girls in Class {class_num} received ITNs?"
-            
-            if boys_col in district_data.columns:
-                district_stats['boys'] += int(district_data[boys_col].fillna(0).sum())
-            if girls_col in district_data.columns:
-                district_stats['girls'] += int(district_data[girls_col].fillna(0).sum())
-        
-        # ITNs left at school - this should be per school, not per class
-        itn_left_col = "ITNs left at the school for pupils who were absent."
-        if itn_left_col in district_data.columns:
-            district_stats['left'] += int(district_data[itn_left_col].fillna(0).sum())
-        
-        # Total ITNs = boys + girls + left (all ITNs distributed or allocated)
-        district_stats['itn'] = district_stats['boys'] + district_stats['girls'] + district_stats['left']
-        
-        # Calculate coverage
-        district_stats['coverage'] = (district_stats['itn'] / district_stats['enrollment'] * 100) if district_stats['enrollment'] > 0 else 0
-        district_stats['itn_remaining'] = district_stats['enrollment'] - district_stats['itn']
-        
-        district_summary.append(district_stats)
-    
-    summaries['district'] = district_summary
+    named_district = chiefdom_totals.index.get_level_values('District').notna()
+    named_chiefdom = chiefdom_totals.index.get_level_values('Chiefdom').notna()
+    district_groups = chiefdom_totals.assign(chiefdoms=named_chiefdom)[named_district]
+    district_totals = add_coverage(district_groups.groupby(level='District', observed=True, sort=False).sum())
+    summaries['district'] = district_totals.rename_axis('district').reset_index()[
+        ['district', 'schools', 'chiefdoms', 'boys', 'girls', 'enrollment', 'itn', 'left', 'coverage', 'itn_remaining']
+    ].to_dict('records')
     
     # Chiefdom Summary - UPDATED TO INCLUDE ITNs LEFT
-    chiefdom_summary = []
-    for district in df['District'].dropna().unique():
-        district_data = df[df['District'] == district]
-        for chiefdom in district_data['Chiefdom'].dropna().unique():
-            chiefdom_data = district_data[district_data['Chiefdom'] == chiefdom]
-            chiefdom_stats = {
-                'district': district,
-                'chiefdom': chiefdom,
-                'schools': len(chiefdom_data),
-                'boys': 0,
-                'girls': 0,
-                'enrollment': 0,
-                'itn': 0,
-                'left': 0
-            }
-            
-            for class_num in range(1, 6):
-                # Total enrollment from "Number of enrollments in class X"
-                enrollment_col = f"How many pupils are enrolled in Class {class_num}?"
-                if enrollment_col in chiefdom_data.columns:
-                    chiefdom_stats['enrollment'] += int(chiefdom_data[enrollment_col].fillna(0).sum())
-                
-                # Boys and girls for gender analysis AND ITN calculation
-                boys_col = f"How many boys in Class {class_num} received ITNs?"
-                girls_col = f"How many girls in Class {class_num} received ITNs?"
-                
-                if boys_col in chiefdom_data.columns:
-                    chiefdom_stats['boys'] += int(chiefdom_data[boys_col].fillna(0).sum())
-                if girls_col in chiefdom_data.columns:
-                    chiefdom_stats['girls'] += int(chiefdom_data[girls_col].fillna(0).sum())
-            
-            # ITNs left at school - this should be per school, not per class
-            itn_left_col = "ITNs left at the school for pupils who were absent."
-            if itn_left_col in chiefdom_data.columns:
-                chiefdom_stats['left'] += int(chiefdom_data[itn_left_col].fillna(0).sum())
-            
-            # Total ITNs = boys + girls + left (all ITNs distributed or allocated)
-            chiefdom_stats['itn'] = chiefdom_stats['boys'] + chiefdom_stats['girls'] + chiefdom_stats['left']
-            
-            # Calculate coverage
-            chiefdom_stats['coverage'] = (chiefdom_stats['itn'] / chiefdom_stats['enrollment'] * 100) if chiefdom_stats['enrollment'] > 0 else 0
-            chiefdom_stats['itn_remaining'] = chiefdom_stats['enrollment'] - chiefdom_stats['itn']
-            
-            chiefdom_summary.append(chiefdom_stats)
-    
-    summaries['chiefdom'] = chiefdom_summary
+    chiefdom_groups = chiefdom_totals[named_district & named_chiefdom]
+    # Keep chiefdoms together under their district, in order of first appearance
+    district_rank = district_totals.index.get_indexer(chiefdom_groups.index.get_level_values('District'))
+    chiefdom_groups = chiefdom_groups.iloc[np.argsort(district_rank, kind='stable')]
+    summaries['chiefdom'] = add_coverage(chiefdom_groups).rename_axis(['district', 'chiefdom']).reset_index()[
+        ['district', 'chiefdom', 'schools', 'boys', 'girls', 'enrollment', 'itn', 'left', 'coverage', 'itn_remaining']
+    ].to_dict('records')
     
     return summaries
 
+# Coverage bin edges and the color for each bin
+_COVERAGE_BINS = np.array([20, 40, 60, 80, 100])
+_COVERAGE_COLORS = np.array([
+    '#d32f2f',  # Red
+    '#f57c00',  # Orange
+    '#fbc02d',  # Yellow
+    '#388e3c',  # Light Green
+    '#1976d2',  # Blue
+    '#4a148c',  # Purple (100% coverage)
+])
+
+def get_coverage_colors(coverage_percents):
+    """Get colors for an array of coverage percentages"""
+    return _COVERAGE_COLORS[np.digitize(coverage_percents, _COVERAGE_BINS)]
+
 def get_coverage_color(coverage_percent):
     """Get color based on coverage percentage"""
-    if coverage_percent < 20:
-        return '#d32f2f'  # Red
-    elif coverage_percent < 40:
-        return '#f57c00'  # Orange
-    elif coverage_percent < 60:
-        return '#fbc02d'  # Yellow
-    elif coverage_percent < 80:
-        return '#388e3c'  # Light Green
-    elif coverage_percent < 100:
-        return '#1976d2'  # Blue
-    else:
-        return '#4a148c'  # Purple (100% coverage)
-
-def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
+    return str(get_coverage_colors([coverage_percent])[0])
+
+# Status bin edges and the label for each bin
+_STATUS_BINS = np.array([20, 40, 60, 80])
+_STATUS_LABELS = np.array(["🔴 Critical", "🟠 Poor", "🟡 Fair", "🟢 Good", "✅ Excellent"])
+
+def get_coverage_statuses(coverage_percents):
+    """Get status labels for an array of coverage percentages"""
+    return _STATUS_LABELS[np.digitize(coverage_percents, _STATUS_BINS)]
+
+def calculate_chiefdom_totals(itn_df):
+    """Sum enrollment and distributed ITNs per (upper-case district, chiefdom) in one pass"""
+    return itn_df.groupby(["District_upper", "Chiefdom"], observed=True)[["Total_Enrollment", "Distributed_ITNs"]].sum()
+
+def create_itn_coverage_dashboard(gdf, chiefdom_totals, district_name, cols=4, chiefdom_bounds=None):
     """Create ITN coverage dashboard without numbers in brackets - CLEAN VERSION"""
     
+    if chiefdom_totals is None:
+        st.error("No ITN data available to build the dashboard")
+        return None
+    
     # Filter shapefile for the district
-    district_gdf = gdf[gdf['FIRST_DNAM'] == district_name].copy()
+    district_gdf = gdf[gdf['FIRST_DNAM'] == district_name]
     
     if len(district_gdf) == 0:
         st.error(f"No chiefdoms found for {district_name} district in shapefile")
@@ -408,6 +332,19 @@ def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
     # Get unique chiefdoms from shapefile
     chiefdoms = sorted(district_gdf['FIRST_CHIE'].dropna().unique())
     
+    # Shapes and bounds for every chiefdom, grouped once instead of filtered per subplot
+    chiefdom_shapes = dict(list(district_gdf.groupby('FIRST_CHIE')))
+    if chiefdom_bounds is None:
+        chiefdom_bounds = {(district_name, chiefdom): shapes.total_bounds for chiefdom, shapes in chiefdom_shapes.items()}
+    
+    # Totals, coverage and color for every chiefdom in the district
+    chiefdom_stats = chiefdom_totals.reindex(
+        pd.MultiIndex.from_product([[district_name.upper()], chiefdoms]), fill_value=0
+    ).droplevel(0)
+    enrollment_totals = chiefdom_stats["Total_Enrollment"]
+    coverage_percents = (chiefdom_stats["Distributed_ITNs"] / enrollment_totals * 100).where(enrollment_totals > 0, 0)
+    coverage_colors = pd.Series(get_coverage_colors(coverage_percents.to_numpy()), index=coverage_percents.index)
+    
     # Calculate rows needed
     rows = math.ceil(len(chiefdoms) / cols)
     
@@ -416,7 +353,10 @@ def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
     fig_height = rows * 3.5  # Height per row optimized for Word
     
     # Create subplot figure optimized for Word export
-    fig, axes = plt.subplots(rows, cols, figsize=(fig_width, fig_height))
+    # (no ticks and equal aspect for every panel, set once at creation; a bare Figure
+    # is never registered with pyplot, so it is freed as soon as it goes out of scope)
+    fig = Figure(figsize=(fig_width, fig_height))
+    axes = fig.subplots(rows, cols, subplot_kw={"xticks": [], "yticks": [], "aspect": "equal"})
     fig.suptitle(f'{district_name} District - ITN Coverage Analysis', 
                  fontsize=18, fontweight='bold', y=0.98)
     
@@ -426,25 +366,19 @@ def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
     elif cols == 1:
         axes = axes.reshape(-1, 1)
     
+    # Remove the box frame from every panel
+    for ax in axes.flat:
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+    
     # Plot each chiefdom
     for idx, chiefdom in enumerate(chiefdoms):
         row = idx // cols
         col = idx % cols
         ax = axes[row, col]
         
-        # Filter shapefile for this specific chiefdom
-        chiefdom_gdf = district_gdf[district_gdf['FIRST_CHIE'] == chiefdom].copy()
-        
-        # Filter ITN data for this district and chiefdom
-        district_data = itn_df[itn_df["District"].str.upper() == district_name.upper()].copy()
-        chiefdom_data = district_data[district_data["Chiefdom"] == chiefdom].copy()
-        
-        # Calculate totals for this chiefdom using consistent method
-        enrollment_total = int(chiefdom_data["Total_Enrollment"].sum()) if len(chiefdom_data) > 0 else 0
-        itns_total = int(chiefdom_data["Distributed_ITNs"].sum()) if len(chiefdom_data) > 0 else 0
-        
-        # Calculate coverage percentage
-        coverage_percent = (itns_total / enrollment_total * 100) if enrollment_total > 0 else 0
+        chiefdom_gdf = chiefdom_shapes[chiefdom]
+        coverage_percent = coverage_percents[chiefdom]
         
         # Handle 100% coverage display logic
         if coverage_percent >= 100:
@@ -454,11 +388,8 @@ def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
             # Normal display when coverage is less than 100%
             display_coverage_percent = coverage_percent
         
-        # Get color based on actual coverage (use original coverage for color determination)
-        coverage_color = get_coverage_color(coverage_percent)
-        
-        # Plot chiefdom boundary with coverage color
-        chiefdom_gdf.plot(ax=ax, color=coverage_color, edgecolor='black', alpha=0.8, linewidth=1.5)
+        # Plot chiefdom boundary with coverage color (based on actual coverage)
+        chiefdom_gdf.plot(ax=ax, color=coverage_colors[chiefdom], edgecolor='black', alpha=0.8, linewidth=1.5, aspect='equal')
         
         # MODIFIED: Set title with just chiefdom name (NO BRACKETS)
         ax.set_title(f'{chiefdom}', 
@@ -467,7 +398,7 @@ def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
         # Add coverage percentage in the center of the chiefdom
         if len(chiefdom_gdf) > 0:
             # Get center of chiefdom
-            bounds = chiefdom_gdf.total_bounds
+            bounds = chiefdom_bounds[(district_name, chiefdom)]
             center_x = (bounds[0] + bounds[2]) / 2
             center_y = (bounds[1] + bounds[3]) / 2
             
@@ -477,24 +408,8 @@ def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
                    ha='center', va='center',
                    bbox=dict(boxstyle='round,pad=0.5', facecolor='black', alpha=0.7))
         
-        # Remove axis labels and ticks for cleaner look
-        ax.set_xticks([])
-        ax.set_yticks([])
-        ax.set_xlabel('')
-        ax.set_ylabel('')
-        
-        # Remove the box frame
-        for spine in ax.spines.values():
-            spine.set_visible(False)
-        
-        # Add very light grid
-        ax.grid(True, alpha=0.2, linestyle='--', linewidth=0.5)
-        
-        # Set equal aspect ratio
-        ax.set_aspect('equal')
-        
         # Set bounds to chiefdom extent with minimal padding for better fit
-        bounds = chiefdom_gdf.total_bounds
+        bounds = chiefdom_bounds[(district_name, chiefdom)]
         padding = 0.005  # Reduced padding for better fit in Word
         ax.set_xlim(bounds[0] - padding, bounds[2] + padding)
         ax.set_ylim(bounds[1] - padding, bounds[3] + padding)
@@ -507,11 +422,12 @@ def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
         axes[row, col].set_visible(False)
     
     # Optimize layout for Word document
-    plt.tight_layout()
-    plt.subplots_adjust(top=0.90, hspace=0.35, wspace=0.25)  # Increased space below title
+    fig.tight_layout()
+    fig.subplots_adjust(top=0.90, hspace=0.35, wspace=0.25)  # Increased space below title
     
     return fig
 
+@st.cache_data
 def generate_simple_summary(itn_df):
     """Generate simple summary with just totals and coverage - USING CONSISTENT CALCULATIONS"""
     
@@ -519,11 +435,11 @@ def generate_simple_summary(itn_df):
     
     # District totals
     for district in ["BO", "BOMBALI"]:
-        district_data = itn_df[itn_df["District"].str.upper() == district.upper()]
+        district_data = itn_df[itn_df["District_upper"] == district]
         
         # FIXED: Using consistent calculation method
-        total_enrollment = int(district_data["Total_Enrollment"].sum())
-        total_itns_distributed = int(district_data["Distributed_ITNs"].sum())
+        total_enrollment = district_data["Total_Enrollment"].sum()
+        total_itns_distributed = district_data["Distributed_ITNs"].sum()
         coverage = (total_itns_distributed / total_enrollment * 100) if total_enrollment > 0 else 0
         
         summary_data.append({
@@ -536,17 +452,13 @@ def generate_simple_summary(itn_df):
     
     # Chiefdom totals for each district
     for district in ["BO", "BOMBALI"]:
-        district_data = itn_df[itn_df["District"].str.upper() == district.upper()]
+        district_data = itn_df[itn_df["District_upper"] == district]
         
-        # Group by chiefdom
-        chiefdoms = district_data['Chiefdom'].dropna().unique()
+        # Group by chiefdom (categorical, so groups come out in name order)
+        chiefdom_sums = district_data.groupby('Chiefdom', observed=True)[["Total_Enrollment", "Distributed_ITNs"]].sum()
         
-        for chiefdom in sorted(chiefdoms):
-            chiefdom_data = district_data[district_data['Chiefdom'] == chiefdom]
-            
+        for chiefdom, total_enrollment, total_itns_distributed in chiefdom_sums.itertuples():
             # FIXED: Using consistent calculation method
-            total_enrollment = int(chiefdom_data["Total_Enrollment"].sum())
-            total_itns_distributed = int(chiefdom_data["Distributed_ITNs"].sum())
             coverage = (total_itns_distributed / total_enrollment * 100) if total_enrollment > 0 else 0
             
             summary_data.append({
@@ -557,7 +469,112 @@ def generate_simple_summary(itn_df):
                 'Coverage': f"{coverage:.1f}%"
             })
     
-    return summary_data
+    return pd.DataFrame(summary_data)
+
+@st.cache_data
+def load_excel(path):
+    """Load the embedded Excel file once and reuse it across reruns"""
+    # calamine (Rust) parses XLSX much faster than the default openpyxl engine
+    return pd.read_excel(path, engine="calamine")
+
+@st.cache_resource
+def load_shapefile(path):
+    """Load the embedded shapefile once and share it across reruns"""
+    return gpd.read_file(path)
+
+@st.cache_resource
+def load_render_shapefile(path, tolerance=0.0005):
+    """Load the shapefile with simplified outlines for drawing the dashboards"""
+    # Tolerance is in degrees (~55 m); sub-pixel detail at dashboard size is dropped
+    render_gdf = load_shapefile(path).copy()
+    render_gdf["geometry"] = render_gdf.geometry.simplify(tolerance, preserve_topology=True)
+    return render_gdf
+
+@st.cache_resource
+def load_chiefdom_bounds(path):
+    """Bounds of every (district, chiefdom) outline in the render shapefile, computed once"""
+    render_gdf = load_render_shapefile(path)
+    bounds = render_gdf.geometry.bounds.groupby([render_gdf['FIRST_DNAM'], render_gdf['FIRST_CHIE']]).agg(
+        {'minx': 'min', 'miny': 'min', 'maxx': 'max', 'maxy': 'max'}
+    )
+    return dict(zip(bounds.index, bounds.to_numpy()))
+
+@st.cache_data(show_spinner=False)
+def build_itn_dashboard_png(shapefile_path, _chiefdom_totals, itn_hash, district_name, cols=4):
+    """Render a district ITN coverage dashboard to PNG bytes, cached per district and ITN totals"""
+    fig = create_itn_coverage_dashboard(load_render_shapefile(shapefile_path), _chiefdom_totals, district_name, cols,
+                                        load_chiefdom_bounds(shapefile_path))
+    if fig is None:
+        return None
+    
+    # 150 DPI is sharp at Word page width, a quarter of the pixels of 300;
+    # zlib level 1 encodes faster than the default 6 at the cost of a larger file.
+    # No bbox_inches='tight': tight_layout already fits the panels, and the extra
+    # measuring draw it costs buys only a few pixels of trimmed margin
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', dpi=150, pil_kwargs={'compress_level': 1})
+    return buffer.getvalue()
+
+@st.cache_data(show_spinner=False)
+def fit_png_to_page(png_bytes, max_width=1460):
+    """Downscale a PNG to the page's maximum image width (Streamlit's own limit)
+    once, so st.image doesn't resize and re-encode it on every rerun"""
+    image = Image.open(BytesIO(png_bytes))
+    if image.width <= max_width:
+        return png_bytes
+    
+    image = image.resize((max_width, round(image.height * max_width / image.width)), resample=Image.LANCZOS)
+    buffer = BytesIO()
+    image.save(buffer, format='png')
+    return buffer.getvalue()
+
+def dataframe_height(n_rows, max_height=600):
+    """Pixel height that fits a table's header and rows (35px each), capped at max_height"""
+    return min(35 * (n_rows + 1) + 3, max_height)
+
+# Fragments (Streamlit >= 1.33) rerun only their own section when a widget inside them
+# is used; on older versions the section simply runs as part of the whole script
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+@_fragment
+def show_district_dashboard(district_name, png_future):
+    """Show a district's dashboard with its PNG download, from a pending build_itn_dashboard_png call"""
+    st.subheader(f"{district_name} District - ITN Coverage")
+    
+    if png_future is None:
+        st.info(f"No {district_name} district ITN data available")
+        return
+    
+    try:
+        png_itn = png_future.result()
+        if png_itn:
+            # A page-width copy is shown; the full-resolution PNG is the download
+            st.image(fit_png_to_page(png_itn))
+            
+            st.download_button(
+                label=f"📥 Download {district_name} District ITN Coverage Dashboard (PNG)",
+                data=png_itn,
+                file_name=f"{district_name}_District_ITN_Coverage_Dashboard.png",
+                mime="image/png"
+            )
+        else:
+            st.warning(f"Could not generate {district_name} District ITN coverage dashboard")
+    except Exception as e:
+        st.error(f"Error generating {district_name} District ITN coverage dashboard: {e}")
+
+# ITN calculation formula shown at the bottom of the page
+_FORMULA_MD = """
+**Complete ITN Distribution Formula:**
+
+ITNs Distributed = Boys ITNs (Classes 1-5) + Girls ITNs (Classes 1-5) + ITNs Left at School for Absent Pupils
+
+**Components:**
+- **Boys ITNs**: Sum of boys who received ITNs across all classes (1-5)
+- **Girls ITNs**: Sum of girls who received ITNs across all classes (1-5)  
+- **ITNs Left at School**: ITNs reserved at school for pupils who were absent during distribution
+
+This ensures complete accounting of all ITN distribution efforts including direct distribution and reserves for absent students.
+"""
 
 # Streamlit App
 st.title("🛡️ Section 3: ITN Coverage Analysis")
@@ -592,7 +609,7 @@ st.info("""
 # Load the embedded data files
 try:
     # Load Excel file (embedded)
-    df_original = pd.read_excel("SBD_Final_data_dissemination_pmi_evolve_16_09_2025.xlsx")
+    df_original = load_excel("SBD_Final_data_dissemination_pmi_evolve_16_09_2025.xlsx")
     st.success(f"✅ Excel file loaded successfully! Found {len(df_original)} records.")
     
 except Exception as e:
@@ -602,7 +619,7 @@ except Exception as e:
 
 # Load shapefile (embedded)
 try:
-    gdf = gpd.read_file("Chiefdom2021.shp")
+    gdf = load_shapefile("Chiefdom2021.shp")
     st.success(f"✅ Shapefile loaded successfully! Found {len(gdf)} features.")
     
 except Exception as e:
@@ -619,84 +636,101 @@ try:
     itn_df = extract_itn_data_from_excel(df_original)
     st.success(f"✅ ITN data extracted successfully! Found {len(itn_df)} records.")
     
-    # Debug: Show comprehensive ITNs calculation breakdown
-    with st.expander("🔍 Debug: ITN Calculation Verification"):
-        st.write("**Available columns containing 'ITN' or 'left':**")
-        itn_columns = [col for col in df_original.columns if 'itn' in col.lower() or 'left' in col.lower()]
-        for col in itn_columns:
-            st.write(f"- {col}")
-        
-        # Calculate using consistent method
-        st.write("**📊 ITN Distribution Breakdown (Using Consistent Method):**")
-        total_data = calculate_itn_totals_for_dataframe(df_original)
-        
-        # Show boys by class
-        st.write("**Boys ITNs by Class:**")
-        for class_name, count in total_data['boys_by_class'].items():
-            st.write(f"  - {class_name}: {count:,}")
-        st.write(f"  - **Total Boys**: {total_data['boys']:,}")
-        
-        # Show girls by class  
-        st.write("**Girls ITNs by Class:**")
-        for class_name, count in total_data['girls_by_class'].items():
-            st.write(f"  - {class_name}: {count:,}")
-        st.write(f"  - **Total Girls**: {total_data['girls']:,}")
-        
-        # Show left at school details
-        st.write("**ITNs Left at School Analysis:**")
-        left_col = "ITNs left at the school for pupils who were absent."
-        if left_col in df_original.columns:
-            left_values = df_original[left_col].dropna()
-            st.write(f"  - Number of schools with 'left' data: {len(left_values)}")
-            st.write(f"  - Min left at school: {left_values.min()}")
-            st.write(f"  - Max left at school: {left_values.max()}")
-            st.write(f"  - Mean left at school: {left_values.mean():.1f}")
-            st.write(f"  - **Total Left at School**: {total_data['left']:,}")
+    # Debug: Show comprehensive ITNs calculation breakdown (only when requested)
+    if st.sidebar.checkbox("Show ITN debug", value=False):
+        with st.expander("🔍 Debug: ITN Calculation Verification"):
+            # Output is collected into a few markdown blocks rather than one st.write per line
+            itn_columns = [col for col in df_original.columns if 'itn' in col.lower() or 'left' in col.lower()]
+            lines = ["**Available columns containing 'ITN' or 'left':**"]
+            lines += [f"- {col}" for col in itn_columns]
             
-            # Show sample of left values
-            st.write("  - Sample 'left' values from first 10 schools:")
-            for i in range(min(10, len(left_values))):
-                st.write(f"    School {i+1}: {int(left_values.iloc[i])}")
-        else:
-            st.error(f"  - Column '{left_col}' not found!")
-        
-        st.write(f"**🎯 FINAL TOTALS:**")
-        st.write(f"- Boys ITNs: {total_data['boys']:,}")
-        st.write(f"- Girls ITNs: {total_data['girls']:,}")
-        st.write(f"- Left at School: {total_data['left']:,}")
-        st.write(f"- **Grand Total ITNs: {total_data['total_distributed']:,}**")
-        
-        calculated_total = int(itn_df["Distributed_ITNs"].sum())
-        st.write(f"- **DataFrame Total: {calculated_total:,}**")
-        
-        if calculated_total != total_data['total_distributed']:
-            st.error(f"❌ MISMATCH! Expected {total_data['total_distributed']:,} but got {calculated_total:,}")
-            st.write("**Investigating the mismatch...**")
+            # Calculate using consistent method
+            lines += ["", "**📊 ITN Distribution Breakdown (Using Consistent Method):**"]
+            total_data = calculate_itn_totals_for_dataframe(df_original)
+            st.markdown("\n".join(lines))
             
-            # Check if we're double-counting or missing something
-            st.write("**Manual verification from raw data:**")
-            manual_boys = sum([df_original[f"How many boys in Class {i} received ITNs?"].fillna(0).sum() for i in range(1, 6) if f"How many boys in Class {i} received ITNs?" in df_original.columns])
-            manual_girls = sum([df_original[f"How many girls in Class {i} received ITNs?"].fillna(0).sum() for i in range(1, 6) if f"How many girls in Class {i} received ITNs?" in df_original.columns])
-            manual_left = df_original[left_col].fillna(0).sum() if left_col in df_original.columns else 0
-            manual_total = manual_boys + manual_girls + manual_left
+            # Show boys and girls by class
+            st.dataframe(pd.DataFrame({
+                'Boys ITNs': pd.Series(total_data['boys_by_class'], dtype='int64'),
+                'Girls ITNs': pd.Series(total_data['girls_by_class'], dtype='int64')
+            }))
+            lines = [
+                f"- **Total Boys**: {total_data['boys']:,}",
+                f"- **Total Girls**: {total_data['girls']:,}",
+                "",
+                "**ITNs Left at School Analysis:**"
+            ]
             
-            st.write(f"Manual calculation: Boys={manual_boys:,}, Girls={manual_girls:,}, Left={manual_left:,}, Total={manual_total:,}")
+            # Show left at school details
+            left_col = "ITNs left at the school for pupils who were absent."
+            if left_col in df_original.columns:
+                left_values = df_original[left_col].dropna()
+                lines += [
+                    f"  - Number of schools with 'left' data: {len(left_values)}",
+                    f"  - Min left at school: {left_values.min()}",
+                    f"  - Max left at school: {left_values.max()}",
+                    f"  - Mean left at school: {left_values.mean():.1f}",
+                    f"  - **Total Left at School**: {total_data['left']:,}",
+                    "  - Sample 'left' values from first 10 schools:"
+                ]
+                st.markdown("\n".join(lines))
+                
+                # Show sample of left values
+                st.dataframe(pd.DataFrame({
+                    'School': range(1, min(10, len(left_values)) + 1),
+                    'ITNs Left': left_values.head(10).astype(int).to_numpy()
+                }), hide_index=True)
+            else:
+                st.markdown("\n".join(lines))
+                st.error(f"  - Column '{left_col}' not found!")
             
-        else:
-            st.success("✅ ITN calculations match perfectly!")
+            calculated_total = int(itn_df["Distributed_ITNs"].sum())
+            st.markdown("\n".join([
+                f"**🎯 FINAL TOTALS:**",
+                f"- Boys ITNs: {total_data['boys']:,}",
+                f"- Girls ITNs: {total_data['girls']:,}",
+                f"- Left at School: {total_data['left']:,}",
+                f"- **Grand Total ITNs: {total_data['total_distributed']:,}**",
+                f"- **DataFrame Total: {calculated_total:,}**"
+            ]))
             
-        # What should the correct total be?
-        st.write("**🤔 Expected ITN Total Check:**")
-        st.write("Based on your feedback, the total should NOT be 216,851.")
-        st.write(f"Current calculation gives: {total_data['total_distributed']:,}")
-        st.write("Please verify if this breakdown looks correct:")
-        st.write(f"- Boys receiving ITNs: {total_data['boys']:,}")
-        st.write(f"- Girls receiving ITNs: {total_data['girls']:,}")  
-        st.write(f"- ITNs left for absent pupils: {total_data['left']:,}")
-        st.write("")
-        st.write("**Question: Should we exclude the 'ITNs left at school' from the total?**")
-        st.write("If yes, the total would be:", f"{total_data['boys'] + total_data['girls']:,}")
+            if calculated_total != total_data['total_distributed']:
+                st.error(f"❌ MISMATCH! Expected {total_data['total_distributed']:,} but got {calculated_total:,}")
+                
+                # Check if we're double-counting or missing something
+                boys_cols = [col for col in (f"How many boys in Class {i} received ITNs?" for i in range(1, 6)) if col in df_original.columns]
+                girls_cols = [col for col in (f"How many girls in Class {i} received ITNs?" for i in range(1, 6)) if col in df_original.columns]
+                manual_boys = np.nan_to_num(df_original[boys_cols].to_numpy()).sum()
+                manual_girls = np.nan_to_num(df_original[girls_cols].to_numpy()).sum()
+                manual_left = np.nan_to_num(df_original[left_col].to_numpy()).sum() if left_col in df_original.columns else 0
+                manual_total = manual_boys + manual_girls + manual_left
+                
+                st.markdown("\n\n".join([
+                    "**Investigating the mismatch...**",
+                    "**Manual verification from raw data:**",
+                    f"Manual calculation: Boys={manual_boys:,}, Girls={manual_girls:,}, Left={manual_left:,}, Total={manual_total:,}"
+                ]))
+                
+            else:
+                st.success("✅ ITN calculations match perfectly!")
             
+            # What should the correct total be?
+            st.markdown("\n".join([
+                "**🤔 Expected ITN Total Check:**",
+                "",
+                "Based on your feedback, the total should NOT be 216,851.",
+                "",
+                f"Current calculation gives: {total_data['total_distributed']:,}",
+                "",
+                "Please verify if this breakdown looks correct:",
+                f"- Boys receiving ITNs: {total_data['boys']:,}",
+                f"- Girls receiving ITNs: {total_data['girls']:,}",
+                f"- ITNs left for absent pupils: {total_data['left']:,}",
+                "",
+                "**Question: Should we exclude the 'ITNs left at school' from the total?**",
+                "",
+                f"If yes, the total would be: {total_data['boys'] + total_data['girls']:,}"
+            ]))
             
 except Exception as e:
     st.error(f"Error extracting ITN data: {e}")
@@ -709,11 +743,11 @@ if show_itn_details and len(itn_df) > 0:
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_enrollment = int(itn_df["Total_Enrollment"].sum())
+        total_enrollment = itn_df["Total_Enrollment"].sum()
         st.metric("Total Enrollment", f"{total_enrollment:,}")
     
     with col2:
-        total_distributed = int(itn_df["Distributed_ITNs"].sum())
+        total_distributed = itn_df["Distributed_ITNs"].sum()
         st.metric("ITNs Distributed", f"{total_distributed:,}")
     
     with col3:
@@ -727,105 +761,69 @@ if show_itn_details and len(itn_df) > 0:
 # Create dashboards
 st.header("🛡️ ITN Coverage Dashboards")
 
-# BO District ITN Coverage Dashboard
-st.subheader("BO District - ITN Coverage")
+# Per-chiefdom totals shared by both dashboards
+chiefdom_totals = calculate_chiefdom_totals(itn_df) if len(itn_df) > 0 else None
 
-with st.spinner("Generating BO District ITN coverage dashboard..."):
-    try:
-        fig_bo_itn = create_itn_coverage_dashboard(gdf, itn_df, "BO", columns)
-        if fig_bo_itn:
-            st.pyplot(fig_bo_itn)
-            
-            # Save figure option
-            buffer_bo_itn = BytesIO()
-            fig_bo_itn.savefig(buffer_bo_itn, format='png', dpi=300, bbox_inches='tight')
-            buffer_bo_itn.seek(0)
-            
-            st.download_button(
-                label="📥 Download BO District ITN Coverage Dashboard (PNG)",
-                data=buffer_bo_itn,
-                file_name="BO_District_ITN_Coverage_Dashboard.png",
-                mime="image/png"
-            )
-        else:
-            st.warning("Could not generate BO District ITN coverage dashboard")
-    except Exception as e:
-        st.error(f"Error generating BO District ITN coverage dashboard: {e}")
+# Checksum of the chiefdom totals the dashboards are drawn from, used as their cache key
+# instead of letting Streamlit hash the frames; adler32 over the row hashes is enough here
+itn_hash = zlib.adler32(pd.util.hash_pandas_object(chiefdom_totals).values) if chiefdom_totals is not None else 0
+
+# Districts that have ITN data; the others have nothing to draw
+present_districts = set(chiefdom_totals.index.get_level_values("District_upper")) if chiefdom_totals is not None else set()
+
+# Render both district dashboards concurrently (each figure is a standalone Figure, and the
+# workers share this run's script context so cache hits and messages behave as usual)
+with st.spinner("Generating ITN coverage dashboards..."):
+    with ThreadPoolExecutor(max_workers=2, initializer=add_script_run_ctx, initargs=(None, get_script_run_ctx())) as executor:
+        dashboard_pngs = {
+            district: executor.submit(build_itn_dashboard_png, "Chiefdom2021.shp", chiefdom_totals, itn_hash, district, columns)
+            for district in ("BO", "BOMBALI") if district in present_districts
+        }
+
+# BO District ITN Coverage Dashboard
+show_district_dashboard("BO", dashboard_pngs.get("BO"))
 
 st.divider()
 
 # BOMBALI District ITN Coverage Dashboard
-st.subheader("BOMBALI District - ITN Coverage")
-
-with st.spinner("Generating BOMBALI District ITN coverage dashboard..."):
-    try:
-        fig_bombali_itn = create_itn_coverage_dashboard(gdf, itn_df, "BOMBALI", columns)
-        if fig_bombali_itn:
-            st.pyplot(fig_bombali_itn)
-            
-            # Save figure option
-            buffer_bombali_itn = BytesIO()
-            fig_bombali_itn.savefig(buffer_bombali_itn, format='png', dpi=300, bbox_inches='tight')
-            buffer_bombali_itn.seek(0)
-            
-            st.download_button(
-                label="📥 Download BOMBALI District ITN Coverage Dashboard (PNG)",
-                data=buffer_bombali_itn,
-                file_name="BOMBALI_District_ITN_Coverage_Dashboard.png",
-                mime="image/png"
-            )
-        else:
-            st.warning("Could not generate BOMBALI District ITN coverage dashboard")
-    except Exception as e:
-        st.error(f"Error generating BOMBALI District ITN coverage dashboard: {e}")
+show_district_dashboard("BOMBALI", dashboard_pngs.get("BOMBALI"))
 
 # ITN Analysis
 st.header("📈 ITN Distribution Analysis")
 
 if len(itn_df) > 0:
-    # Calculate ITN statistics using consistent method
-    bo_data = itn_df[itn_df["District"].str.upper() == "BO"]
-    bombali_data = itn_df[itn_df["District"].str.upper() == "BOMBALI"]
+    # Calculate ITN statistics using consistent method (one pass feeds every metric;
+    # dropna=False keeps rows without a district in the overall total)
+    district_sums = itn_df.groupby("District_upper", observed=True, dropna=False)[["Total_Enrollment", "Distributed_ITNs"]].sum()
+    overall_sums = district_sums.sum()
+    district_sums = district_sums.reindex(["BO", "BOMBALI"], fill_value=0)
+    
+    # Per-chiefdom enrollment, ITNs and coverage for BO and BOMBALI from the shared groupby
+    district_chiefdoms = chiefdom_totals[chiefdom_totals.index.get_level_values("District_upper").isin(["BO", "BOMBALI"])].copy()
+    district_chiefdoms["Coverage"] = (district_chiefdoms["Distributed_ITNs"] / district_chiefdoms["Total_Enrollment"] * 100).where(district_chiefdoms["Total_Enrollment"] > 0, 0)
     
     # ITN metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        bo_enrollment = int(bo_data["Total_Enrollment"].sum())
-        bo_distributed = int(bo_data["Distributed_ITNs"].sum())
+        bo_enrollment, bo_distributed = district_sums.loc["BO"]
         bo_coverage = (bo_distributed / bo_enrollment * 100) if bo_enrollment > 0 else 0
         st.metric("BO District ITN Coverage", f"{bo_coverage:.1f}%", f"{bo_distributed}/{bo_enrollment}")
     
     with col2:
-        bombali_enrollment = int(bombali_data["Total_Enrollment"].sum())
-        bombali_distributed = int(bombali_data["Distributed_ITNs"].sum())
+        bombali_enrollment, bombali_distributed = district_sums.loc["BOMBALI"]
         bombali_coverage = (bombali_distributed / bombali_enrollment * 100) if bombali_enrollment > 0 else 0
         st.metric("BOMBALI District ITN Coverage", f"{bombali_coverage:.1f}%", f"{bombali_distributed}/{bombali_enrollment}")
     
     with col3:
-        total_enrollment = int(itn_df["Total_Enrollment"].sum())
-        total_distributed = int(itn_df["Distributed_ITNs"].sum())
+        total_enrollment, total_distributed = overall_sums
         overall_coverage = (total_distributed / total_enrollment * 100) if total_enrollment > 0 else 0
         st.metric("Overall ITN Coverage", f"{overall_coverage:.1f}%", f"{total_distributed}/{total_enrollment}")
     
     with col4:
         # Calculate chiefdoms with good ITN coverage (>= 60%)
-        good_itn_coverage_count = 0
-        total_chiefdoms = 0
-        
-        for district in ["BO", "BOMBALI"]:
-            district_data = itn_df[itn_df["District"].str.upper() == district.upper()]
-            chiefdoms = district_data['Chiefdom'].dropna().unique()
-            
-            for chiefdom in chiefdoms:
-                chiefdom_data = district_data[district_data['Chiefdom'] == chiefdom]
-                enrollment = int(chiefdom_data["Total_Enrollment"].sum())
-                distributed = int(chiefdom_data["Distributed_ITNs"].sum())
-                coverage = (distributed / enrollment * 100) if enrollment > 0 else 0
-                
-                if coverage >= 60:
-                    good_itn_coverage_count += 1
-                total_chiefdoms += 1
+        good_itn_coverage_count = int((district_chiefdoms["Coverage"] >= 60).sum())
+        total_chiefdoms = len(district_chiefdoms)
         
         good_itn_coverage_percent = (good_itn_coverage_count / total_chiefdoms * 100) if total_chiefdoms > 0 else 0
         st.metric("Chiefdoms with Good ITN Coverage", f"{good_itn_coverage_percent:.0f}%", f"{good_itn_coverage_count}/{total_chiefdoms}")
@@ -833,70 +831,41 @@ if len(itn_df) > 0:
     # Detailed ITN coverage table
     st.subheader("📋 Detailed ITN Coverage by Chiefdom")
     
-    detailed_itn_coverage = []
-    for district in ["BO", "BOMBALI"]:
-        district_data = itn_df[itn_df["District"].str.upper() == district.upper()]
-        chiefdoms = sorted(district_data['Chiefdom'].dropna().unique())
-        
-        for chiefdom in chiefdoms:
-            chiefdom_data = district_data[district_data['Chiefdom'] == chiefdom]
-            enrollment = int(chiefdom_data["Total_Enrollment"].sum())
-            distributed = int(chiefdom_data["Distributed_ITNs"].sum())
-            coverage = (distributed / enrollment * 100) if enrollment > 0 else 0
-            
-            # Determine status
-            if coverage >= 80:
-                status = "✅ Excellent"
-            elif coverage >= 60:
-                status = "🟢 Good"
-            elif coverage >= 40:
-                status = "🟡 Fair"
-            elif coverage >= 20:
-                status = "🟠 Poor"
-            else:
-                status = "🔴 Critical"
-            
-            detailed_itn_coverage.append({
-                'District': district,
-                'Chiefdom': chiefdom,
-                'Total Enrollment': enrollment,
-                'ITNs Distributed': distributed,
-                'Coverage %': f"{coverage:.1f}%",
-                'Status': status
-            })
-    
-    itn_coverage_df = pd.DataFrame(detailed_itn_coverage)
-    st.dataframe(itn_coverage_df, use_container_width=True)
+    itn_coverage_df = (
+        district_chiefdoms.reset_index()
+        .assign(**{
+            'Coverage %': lambda d: d["Coverage"],
+            # Dictionary-encoded, so each status label is sent to the browser once
+            'Status': lambda d: pd.Categorical(get_coverage_statuses(d["Coverage"].to_numpy()),
+                                               categories=_STATUS_LABELS, ordered=True)
+        })
+        .rename(columns={
+            'District_upper': 'District',
+            'Total_Enrollment': 'Total Enrollment',
+            'Distributed_ITNs': 'ITNs Distributed'
+        })
+        [['District', 'Chiefdom', 'Total Enrollment', 'ITNs Distributed', 'Coverage %', 'Status']]
+    )
+    st.dataframe(itn_coverage_df, use_container_width=True, height=dataframe_height(len(itn_coverage_df)),
+                 hide_index=True, column_config={
+        'Coverage %': st.column_config.NumberColumn(format="%.1f%%")
+    })
     
     # Distribution Summary
     st.subheader("📊 Distribution Summary")
     
     try:
-        summary_data = generate_simple_summary(itn_df)
-        summary_df = pd.DataFrame(summary_data)
+        summary_df = generate_simple_summary(itn_df)
         
-        st.dataframe(summary_df, use_container_width=True)
+        st.dataframe(summary_df, use_container_width=True, height=dataframe_height(len(summary_df)),
+                     hide_index=True)
     
     except Exception as e:
         st.error(f"Error generating distribution summary: {e}")
 
 # Show the calculation formula clearly
 st.header("🧮 ITN Calculation Formula")
-st.info("""
-**Complete ITN Distribution Formula:**
-
-ITNs Distributed = Boys ITNs (Classes 1-5) + Girls ITNs (Classes 1-5) + ITNs Left at School for Absent Pupils
-
-**Components:**
-- **Boys ITNs**: Sum of boys who received ITNs across all classes (1-5)
-- **Girls ITNs**: Sum of girls who received ITNs across all classes (1-5)  
-- **ITNs Left at School**: ITNs reserved at school for pupils who were absent during distribution
-
-This ensures complete accounting of all ITN distribution efforts including direct distribution and reserves for absent students.
-""")
-
-# Memory optimization - close matplotlib figures
-plt.close('all')
+st.info(_FORMULA_MD)
 
 # Footer
 st.markdown("---")
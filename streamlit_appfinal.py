@@ -6,6 +6,7 @@ import geopandas as gpd
 import math
 from io import BytesIO
 import re
+import zlib
 
 # Custom CSS for the dashboard
 st.markdown("""
@@ -40,170 +41,149 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# QR code field patterns, compiled once
+_DISTRICT_RE = re.compile(r"District:\s*([^\n]+)")
+_CHIEFDOM_RE = re.compile(r"Chiefdom:\s*([^\n]+)")
+
+# Mapping between GPS data chiefdom names and shapefile FIRST_CHIE names
+_CHIEFDOM_MAPPING = {
+    # BO District mappings
+    "Bo City": "BO TOWN",
+    "Badjia": "BADJIA",
+    "Bargbo": "BAGBO",
+    "Bagbwe": "BAGBWE(BAGBE)",
+    "Baoma": "BOAMA",
+    "Bongor": "BONGOR",
+    "Bumpeh": "BUMPE NGAO",
+    "Gbo": "GBO",
+    "Jaiama": "JAIAMA",
+    "Kakua": "KAKUA",
+    "Komboya": "KOMBOYA",
+    "Lugbu": "LUGBU",
+    "Niawa Lenga": "NIAWA LENGA",
+    "Selenga": "SELENGA",
+    "Tinkoko": "TIKONKO",
+    "Valunia": "VALUNIA",
+    "Wonde": "WONDE",
+    
+    # BOMBALI District mappings
+    "Biriwa": "BIRIWA",
+    "Bombali Sebora": "BOMBALI SEBORA",
+    "Bombali Serry": "BOMBALI SIARI",
+    "Gbanti (Bombali)": "GBANTI",
+    "Gbanti": "GBANTI",
+    "Gbendembu": "GBENDEMBU",
+    "Kamaranka": "KAMARANKA",
+    "Magbaimba Ndohahun": "MAGBAIMBA NDORWAHUN",
+    "Makarie": "MAKARI",
+    "Mara": "MARA",
+    "Ngowahun": "N'GOWAHUN",
+    "Paki Masabong": "PAKI MASABONG",
+    "Safroko Limba": "SAFROKO LIMBA",
+    "Makeni City": "MAKENI CITY",
+}
+_CHIEFDOM_MAPPING_UPPER = {key.upper(): value for key, value in _CHIEFDOM_MAPPING.items()}
+
 def create_chiefdom_mapping():
     """Create mapping between GPS data chiefdom names and shapefile FIRST_CHIE names"""
-    chiefdom_mapping = {
-        # BO District mappings
-        "Bo City": "BO TOWN",
-        "Badjia": "BADJIA",
-        "Bargbo": "BAGBO",
-        "Bagbwe": "BAGBWE(BAGBE)",
-        "Baoma": "BOAMA",
-        "Bongor": "BONGOR",
-        "Bumpeh": "BUMPE NGAO",
-        "Gbo": "GBO",
-        "Jaiama": "JAIAMA",
-        "Kakua": "KAKUA",
-        "Komboya": "KOMBOYA",
-        "Lugbu": "LUGBU",
-        "Niawa Lenga": "NIAWA LENGA",
-        "Selenga": "SELENGA",
-        "Tinkoko": "TIKONKO",
-        "Valunia": "VALUNIA",
-        "Wonde": "WONDE",
-        
-        # BOMBALI District mappings
-        "Biriwa": "BIRIWA",
-        "Bombali Sebora": "BOMBALI SEBORA",
-        "Bombali Serry": "BOMBALI SIARI",
-        "Gbanti (Bombali)": "GBANTI",
-        "Gbanti": "GBANTI",
-        "Gbendembu": "GBENDEMBU",
-        "Kamaranka": "KAMARANKA",
-        "Magbaimba Ndohahun": "MAGBAIMBA NDORWAHUN",
-        "Makarie": "MAKARI",
-        "Mara": "MARA",
-        "Ngowahun": "N'GOWAHUN",
-        "Paki Masabong": "PAKI MASABONG",
-        "Safroko Limba": "SAFROKO LIMBA",
-        "Makeni City": "MAKENI CITY",
-    }
-    return chiefdom_mapping
+    return _CHIEFDOM_MAPPING
 
-def map_chiefdom_name(chiefdom_name, mapping):
+def map_chiefdom_name(chiefdom_name, upper_mapping=_CHIEFDOM_MAPPING_UPPER):
     """Map chiefdom name from GPS data to shapefile name"""
     if pd.isna(chiefdom_name):
         return None
     
     chiefdom_name = str(chiefdom_name).strip()
+    upper_name = chiefdom_name.upper()
     
-    # Direct match
-    if chiefdom_name in mapping:
-        return mapping[chiefdom_name]
-    
-    # Case-insensitive match
-    for key, value in mapping.items():
-        if key.upper() == chiefdom_name.upper():
-            return value
+    # Direct and case-insensitive match
+    if upper_name in upper_mapping:
+        return upper_mapping[upper_name]
     
     # Partial match (contains)
-    for key, value in mapping.items():
-        if key.upper() in chiefdom_name.upper() or chiefdom_name.upper() in key.upper():
+    for key, value in upper_mapping.items():
+        if key in upper_name or upper_name in key:
             return value
     
     # Return original if no mapping found
     return chiefdom_name
 
+@st.cache_data
 def extract_itn_data_from_excel(df):
     """Extract ITN coverage data from the Excel file"""
-    # Create empty lists to store extracted data
-    districts, chiefdoms, total_enrollment, total_itns, distributed_itns = [], [], [], [], []
-    
-    # Get chiefdom mapping
-    chiefdom_mapping = create_chiefdom_mapping()
-    
-    # Process each row in the "Scan QR code" column
-    for idx, qr_text in enumerate(df["Scan QR code"]):
-        if pd.isna(qr_text):
-            districts.append(None)
-            chiefdoms.append(None)
-            total_enrollment.append(0)
-            total_itns.append(0)
-            distributed_itns.append(0)
-            continue
-            
-        # Extract values using regex patterns
-        district_match = re.search(r"District:\s*([^\n]+)", str(qr_text))
-        district = district_match.group(1).strip() if district_match else None
-        districts.append(district)
-        
-        chiefdom_match = re.search(r"Chiefdom:\s*([^\n]+)", str(qr_text))
-        original_chiefdom = chiefdom_match.group(1).strip() if chiefdom_match else None
-        
-        # Map chiefdom name to match shapefile
-        mapped_chiefdom = map_chiefdom_name(original_chiefdom, chiefdom_mapping)
-        chiefdoms.append(mapped_chiefdom)
-        
-        # Calculate total enrollment (sum of all class enrollments)
-        enrollment_total = 0
-        for class_num in range(1, 6):  # Classes 1-5
-            enrollment_col = f"How many pupils are enrolled in Class {class_num}?"
-            if enrollment_col in df.columns:
-                class_enrollment = df[enrollment_col].iloc[idx]
-                if pd.notna(class_enrollment):
-                    enrollment_total += int(class_enrollment)
-        
-        total_enrollment.append(enrollment_total)
-        
-        # Calculate total ITNs distributed (boys + girls + left at school)
-        itns_boys_total = 0
-        itns_girls_total = 0
-        itns_left_total = 0
-        
-        for class_num in range(1, 6):  # Classes 1-5
-            # ITNs distributed to boys
-            boys_col = f"How many boys in Class {class_num} received ITNs?"
-            if boys_col in df.columns:
-                boys_itns = df[boys_col].iloc[idx]
-                if pd.notna(boys_itns):
-                    itns_boys_total += int(boys_itns)
-            
-            # ITNs distributed to girls
-            girls_col = f"How many girls in Class {class_num} received ITNs?"
-            if girls_col in df.columns:
-                girls_itns = df[girls_col].iloc[idx]
-                if pd.notna(girls_itns):
-                    itns_girls_total += int(girls_itns)
-        
-        # ITNs left at the school (this appears to be a single value per school, not per class)
-        left_col = "ITNs left at the school for pupils who were absent."
-        if left_col in df.columns:
-            left_itns = df[left_col].iloc[idx]
-            if pd.notna(left_itns):
-                itns_left_total = int(left_itns)
-        
-        # Total ITNs = boys + girls + left at school
-        itns_total = itns_boys_total + itns_girls_total + itns_left_total
-        itns_distributed = itns_boys_total + itns_girls_total + itns_left_total
-        
-        total_itns.append(itns_total)
-        distributed_itns.append(itns_distributed)
+    # Rows without a QR code carry no district/chiefdom and count as 0
+    qr_codes = df["Scan QR code"]
+    has_qr = qr_codes.notna().to_numpy()
+    qr_text = qr_codes.astype(str)
+    
+    # Extract values using regex patterns
+    districts = qr_text.str.extract(_DISTRICT_RE, expand=False).str.strip().where(has_qr)
+    original_chiefdoms = qr_text.str.extract(_CHIEFDOM_RE, expand=False).str.strip().where(has_qr)
+    
+    # Map chiefdom names to match shapefile (once per distinct name, not once per row)
+    chiefdoms = original_chiefdoms.map({name: map_chiefdom_name(name)
+                                        for name in original_chiefdoms.dropna().unique()})
+    
+    # Sum the class columns present in the file (missing values count as 0)
+    def sum_columns(cols):
+        present_cols = [col for col in cols if col in df.columns]
+        return df[present_cols].fillna(0).to_numpy(dtype=np.int64).sum(axis=1)
+    
+    # Calculate total enrollment (sum of all class enrollments, Classes 1-5)
+    enrollment_total = sum_columns([f"How many pupils are enrolled in Class {class_num}?" for class_num in range(1, 6)])
+    
+    # Calculate total ITNs distributed (boys + girls + left at school)
+    itns_boys_total = sum_columns([f"How many boys in Class {class_num} received ITNs?" for class_num in range(1, 6)])
+    itns_girls_total = sum_columns([f"How many girls in Class {class_num} received ITNs?" for class_num in range(1, 6)])
+    
+    # ITNs left at the school (this appears to be a single value per school, not per class)
+    itns_left_total = sum_columns(["ITNs left at the school for pupils who were absent."])
+    
+    # Total ITNs = boys + girls + left at school (distributed ITNs are the same total)
+    itns_total = np.where(has_qr, itns_boys_total + itns_girls_total + itns_left_total, 0)
     
     # Create a new DataFrame with extracted values
     itn_df = pd.DataFrame({
-        "District": districts,
-        "Chiefdom": chiefdoms,
-        "Total_Enrollment": total_enrollment,
-        "Total_ITNs": total_itns,
-        "Distributed_ITNs": distributed_itns
+        "District": districts.to_numpy(),
+        "Chiefdom": chiefdoms.to_numpy(),
+        "Total_Enrollment": np.where(has_qr, enrollment_total, 0),
+        "Total_ITNs": itns_total,
+        "Distributed_ITNs": itns_total
     })
     
+    # Narrow dtypes: per-school counts fit in int32, names repeat across many schools
+    itn_df = itn_df.astype({"District": "category", "Chiefdom": "category",
+                            "Total_Enrollment": np.int32, "Total_ITNs": np.int32, "Distributed_ITNs": np.int32})
+    itn_df["District_upper"] = itn_df["District"].str.upper().astype("category")  # Filter key, computed once
+    
     return itn_df
 
+# Coverage bin edges and the color for each bin
+_COVERAGE_BINS = np.array([20, 40, 60, 80, 100])
+_COVERAGE_COLORS = np.array([
+    '#d32f2f',  # Red
+    '#f57c00',  # Orange
+    '#fbc02d',  # Yellow
+    '#388e3c',  # Light Green
+    '#1976d2',  # Blue
+    '#4a148c',  # Purple (100% coverage)
+])
+
+def get_coverage_colors(coverage_percents):
+    """Get colors for an array of coverage percentages"""
+    return _COVERAGE_COLORS[np.digitize(coverage_percents, _COVERAGE_BINS)]
+
 def get_coverage_color(coverage_percent):
     """Get color based on coverage percentage"""
-    if coverage_percent < 20:
-        return '#d32f2f'  # Red
-    elif coverage_percent < 40:
-        return '#f57c00'  # Orange
-    elif coverage_percent < 60:
-        return '#fbc02d'  # Yellow
-    elif coverage_percent < 80:
-        return '#388e3c'  # Light Green
-    elif coverage_percent < 100:
-        return '#1976d2'  # Blue
-    else:
-        return '#4a148c'  # Purple (100% coverage)
+    return str(get_coverage_colors([coverage_percent])[0])
+
+# Status bin edges and the label for each bin
+_STATUS_BINS = np.array([20, 40, 60, 80])
+_STATUS_LABELS = np.array(["🔴 Critical", "🟠 Poor", "🟡 Fair", "🟢 Good", "✅ Excellent"])
+
+def get_coverage_statuses(coverage_percents):
+    """Get status labels for an array of coverage percentages"""
+    return _STATUS_LABELS[np.digitize(coverage_percents, _STATUS_BINS)]
 
 def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
     """Create ITN coverage dashboard optimized for Word document export"""
@@ -218,6 +198,28 @@ def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
     # Get unique chiefdoms from shapefile
     chiefdoms = sorted(district_gdf['FIRST_CHIE'].dropna().unique())
     
+    # Shapes and bounds for every chiefdom, grouped once instead of filtered per subplot
+    chiefdom_shapes = dict(list(district_gdf.groupby('FIRST_CHIE')))
+    chiefdom_bounds = {chiefdom: shapes.total_bounds for chiefdom, shapes in chiefdom_shapes.items()}
+    
+    # Coverage label position per chiefdom: the bounding-box center, or a point on the
+    # shape itself when that center falls outside it (non-convex chiefdoms)
+    chiefdom_geoms = district_gdf.dissolve(by='FIRST_CHIE').geometry
+    chiefdom_extents = np.array([chiefdom_bounds[chiefdom] for chiefdom in chiefdom_geoms.index])
+    box_centers = gpd.GeoSeries(gpd.points_from_xy((chiefdom_extents[:, 0] + chiefdom_extents[:, 2]) / 2,
+                                                   (chiefdom_extents[:, 1] + chiefdom_extents[:, 3]) / 2),
+                                index=chiefdom_geoms.index)
+    label_points = box_centers.where(chiefdom_geoms.contains(box_centers), chiefdom_geoms.representative_point())
+    
+    # Totals for every chiefdom in the district, summed in one groupby
+    district_data = itn_df[itn_df["District_upper"] == district_name.upper()]
+    chiefdom_totals = district_data.groupby("Chiefdom", observed=True)[["Total_Enrollment", "Total_ITNs"]].sum().reindex(chiefdoms, fill_value=0)
+    
+    # Coverage (capped at 100%) and color for every chiefdom at once
+    enrollment_totals = chiefdom_totals["Total_Enrollment"]
+    coverage_percents = (chiefdom_totals["Total_ITNs"] / enrollment_totals * 100).where(enrollment_totals > 0, 0).clip(upper=100)
+    coverage_colors = pd.Series(get_coverage_colors(coverage_percents.to_numpy()), index=coverage_percents.index)
+    
     # Calculate rows needed
     rows = math.ceil(len(chiefdoms) / cols)
     
@@ -242,23 +244,17 @@ def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
         col = idx % cols
         ax = axes[row, col]
         
-        # Filter shapefile for this specific chiefdom
-        chiefdom_gdf = district_gdf[district_gdf['FIRST_CHIE'] == chiefdom].copy()
-        
-        # Filter ITN data for this district and chiefdom
-        district_data = itn_df[itn_df["District"].str.upper() == district_name.upper()].copy()
-        chiefdom_data = district_data[district_data["Chiefdom"] == chiefdom].copy()
-        
-        # Calculate totals for this chiefdom
-        enrollment_total = int(chiefdom_data["Total_Enrollment"].sum()) if len(chiefdom_data) > 0 else 0
-        itns_total = int(chiefdom_data["Total_ITNs"].sum()) if len(chiefdom_data) > 0 else 0
+        # Shapes and extent for this specific chiefdom
+        chiefdom_gdf = chiefdom_shapes[chiefdom]
+        bounds = chiefdom_bounds[chiefdom]
         
-        # Calculate coverage percentage
-        coverage_percent = (itns_total / enrollment_total * 100) if enrollment_total > 0 else 0
-        coverage_percent = min(coverage_percent, 100)  # Cap at 100%
+        # Totals for this chiefdom
+        enrollment_total = int(chiefdom_totals.at[chiefdom, "Total_Enrollment"])
+        itns_total = int(chiefdom_totals.at[chiefdom, "Total_ITNs"])
         
-        # Get color based on coverage
-        coverage_color = get_coverage_color(coverage_percent)
+        # Coverage percentage and its color
+        coverage_percent = coverage_percents[chiefdom]
+        coverage_color = coverage_colors[chiefdom]
         
         # Plot chiefdom boundary with coverage color
         chiefdom_gdf.plot(ax=ax, color=coverage_color, edgecolor='black', alpha=0.8, linewidth=1.5)
@@ -273,9 +269,7 @@ def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
         # Add coverage percentage in the center of the chiefdom
         if len(chiefdom_gdf) > 0:
             # Get center of chiefdom
-            bounds = chiefdom_gdf.total_bounds
-            center_x = (bounds[0] + bounds[2]) / 2
-            center_y = (bounds[1] + bounds[3]) / 2
+            center_x, center_y = label_points[chiefdom].x, label_points[chiefdom].y
             
             # Add coverage percentage text in the center
             ax.text(center_x, center_y, f"{coverage_percent:.0f}%", 
@@ -300,7 +294,6 @@ def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
         ax.set_aspect('equal')
         
         # Set bounds to chiefdom extent with minimal padding for better fit
-        bounds = chiefdom_gdf.total_bounds
         padding = 0.005  # Reduced padding for better fit in Word
         ax.set_xlim(bounds[0] - padding, bounds[2] + padding)
         ax.set_ylim(bounds[1] - padding, bounds[3] + padding)
@@ -318,50 +311,147 @@ def create_itn_coverage_dashboard(gdf, itn_df, district_name, cols=4):
     
     return fig
 
+@st.cache_data(show_spinner=False)
+def compute_itn_aggregates(itn_df, districts=("BO", "BOMBALI")):
+    """Sum enrollment and distributed ITNs per district, per chiefdom and overall"""
+    value_cols = ["Total_Enrollment", "Distributed_ITNs"]
+    
+    # One groupby for both levels; rows without a chiefdom still count toward their district
+    by_chiefdom = itn_df[itn_df["District_upper"].isin(districts)].groupby(
+        ["District_upper", "Chiefdom"], observed=True, dropna=False)[value_cols].sum().astype(np.int64)
+    by_district = by_chiefdom.groupby(level="District_upper", observed=True).sum().reindex(list(districts), fill_value=0)
+    by_chiefdom = by_chiefdom[by_chiefdom.index.get_level_values("Chiefdom").notna()]
+    
+    return {
+        'by_district': by_district,  # Indexed by district, in the order given
+        'by_chiefdom': by_chiefdom,  # Indexed by (district, chiefdom), sorted by name
+        'overall': itn_df[value_cols].sum().astype(np.int64)
+    }
+
+def with_arrow_strings(df):
+    """Store text columns as Arrow strings so st.dataframe can serialize them without per-cell conversion"""
+    return df.astype({col: "string[pyarrow]" for col in df.select_dtypes(include="object").columns})
+
+@st.cache_data(show_spinner=False)
 def generate_simple_summary(itn_df):
     """Generate simple summary with just totals and coverage"""
     
-    summary_data = []
-    
-    # District totals
-    for district in ["BO", "BOMBALI"]:
-        district_data = itn_df[itn_df["District"].str.upper() == district.upper()]
-        
-        total_enrollment = int(district_data["Total_Enrollment"].sum())
-        total_itns_distributed = int(district_data["Distributed_ITNs"].sum())
-        coverage = (total_itns_distributed / total_enrollment * 100) if total_enrollment > 0 else 0
-        
-        summary_data.append({
-            'Level': 'District',
-            'Name': district,
-            'Total_Enrollment': total_enrollment,
-            'ITNs_Distributed': total_itns_distributed,
-            'Coverage': f"{coverage:.1f}%"
-        })
-    
-    # Chiefdom totals for each district
-    for district in ["BO", "BOMBALI"]:
-        district_data = itn_df[itn_df["District"].str.upper() == district.upper()]
-        
-        # Group by chiefdom
-        chiefdoms = district_data['Chiefdom'].dropna().unique()
-        
-        for chiefdom in sorted(chiefdoms):
-            chiefdom_data = district_data[district_data['Chiefdom'] == chiefdom]
-            
-            total_enrollment = int(chiefdom_data["Total_Enrollment"].sum())
-            total_itns_distributed = int(chiefdom_data["Distributed_ITNs"].sum())
-            coverage = (total_itns_distributed / total_enrollment * 100) if total_enrollment > 0 else 0
-            
-            summary_data.append({
-                'Level': f'{district} Chiefdom',
-                'Name': chiefdom,
-                'Total_Enrollment': total_enrollment,
-                'ITNs_Distributed': total_itns_distributed,
-                'Coverage': f"{coverage:.1f}%"
-            })
+    aggregates = compute_itn_aggregates(itn_df)
+    district_totals = aggregates['by_district']
+    chiefdom_totals = aggregates['by_chiefdom']  # Sorted by district, then chiefdom name
+    
+    # District rows first, then the chiefdom rows of each district
+    enrollment = np.concatenate([district_totals["Total_Enrollment"].to_numpy(), chiefdom_totals["Total_Enrollment"].to_numpy()])
+    distributed = np.concatenate([district_totals["Distributed_ITNs"].to_numpy(), chiefdom_totals["Distributed_ITNs"].to_numpy()])
+    coverage = np.divide(distributed, enrollment, out=np.zeros(len(enrollment)), where=enrollment > 0) * 100
+    chiefdom_districts = chiefdom_totals.index.get_level_values("District_upper").astype(str)
+    
+    return with_arrow_strings(pd.DataFrame({
+        'Level': np.concatenate([np.full(len(district_totals), 'District'), chiefdom_districts + ' Chiefdom']),
+        'Name': np.concatenate([district_totals.index.astype(str), chiefdom_totals.index.get_level_values("Chiefdom").astype(str)]),
+        'Total_Enrollment': enrollment,
+        'ITNs_Distributed': distributed,
+        'Coverage': np.char.mod("%.1f%%", coverage)
+    }))
+
+@st.cache_data
+def load_excel(path):
+    """Load the embedded Excel file once and reuse it across reruns"""
+    return pd.read_excel(path)
+
+@st.cache_resource
+def load_shapefile(path):
+    """Load the embedded shapefile once and share it across reruns"""
+    # Only the district/chiefdom names and shapes are used by the dashboards
+    return gpd.read_file(path, engine="pyogrio", columns=["FIRST_DNAM", "FIRST_CHIE"])
+
+@st.cache_data
+def load_district_chiefdom_counts(path):
+    """Count shapefile chiefdoms per district once; the boundary data never changes"""
+    return load_shapefile(path)['FIRST_DNAM'].astype(str).value_counts().to_dict()
+
+@st.cache_data(show_spinner=False)
+def render_dashboard_png(district_name, itn_df, _gdf, cols=4):
+    """Render a district ITN coverage dashboard to PNG bytes, cached per district and ITN data"""
+    fig = create_itn_coverage_dashboard(_gdf, itn_df, district_name, cols)
+    if fig is None:
+        return None
     
-    return summary_data
+    buffer = BytesIO()
+    # 150 dpi is plenty at 9.5in in Word; fast zlib level since the bytes are cached anyway
+    fig.savefig(buffer, format='png', dpi=150, bbox_inches='tight', pil_kwargs={'compress_level': 1})
+    plt.close(fig)  # Only the bytes are kept; free the figure from pyplot's registry
+    return buffer.getvalue()
+
+@st.cache_data(show_spinner=False)
+def build_word_report(district_name, _png_bytes, _itn_df, itn_hash, chiefdom_count, generated_on):
+    """Build the single-district ITN coverage Word report as .docx bytes, cached per district, data hash and day"""
+    from docx import Document
+    from docx.shared import Inches, Pt
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    
+    # Create Word document
+    doc = Document()
+    
+    # Add title
+    title = doc.add_heading(f'{district_name} District - ITN Coverage Analysis', 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    
+    # Add generation date (day only, so the cached report stays valid until the date changes)
+    date_para = doc.add_paragraph()
+    date_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    date_run = date_para.add_run(f"Generated: {generated_on}")
+    date_run.font.size = Pt(12)
+    
+    doc.add_paragraph()  # Add space
+    
+    # Embed the rendered PNG bytes straight from memory
+    doc.add_picture(BytesIO(_png_bytes), width=Inches(9.5))  # Fits well in Word page
+    
+    # Add format explanation
+    doc.add_heading('ITN Coverage Format', level=2)
+    format_items = [
+        "Title: (ITNs Distributed, Total Enrollment)",
+        "Center: Coverage percentage",
+        "ITN Calculation: Boys ITNs + Girls ITNs + ITNs Left at School",
+        "🔴 Red: < 20% coverage",
+        "🟠 Orange: 20-39% coverage", 
+        "🟡 Yellow: 40-59% coverage",
+        "🟢 Light Green: 60-79% coverage",
+        "🔵 Blue: 80-99% coverage",
+        "🟣 Purple: 100%+ coverage"
+    ]
+    
+    for item in format_items:
+        p = doc.add_paragraph()
+        p.add_run('• ').bold = True
+        p.add_run(item)
+    
+    # Add summary information
+    doc.add_heading('Dashboard Summary', level=2)
+    
+    district_totals = compute_itn_aggregates(_itn_df, (district_name,))['by_district']
+    district_enrollment = int(district_totals.at[district_name, "Total_Enrollment"])
+    district_distributed = int(district_totals.at[district_name, "Distributed_ITNs"])
+    district_coverage = (district_distributed / district_enrollment * 100) if district_enrollment > 0 else 0
+    
+    summary_items = [
+        f"District: {district_name}",
+        f"Total Chiefdoms: {chiefdom_count}",
+        f"Total Enrollment: {district_enrollment:,}",
+        f"ITNs Distributed: {district_distributed:,}",
+        f"ITN Coverage: {district_coverage:.1f}%"
+    ]
+    
+    for item in summary_items:
+        p = doc.add_paragraph()
+        p.add_run('• ').bold = True
+        p.add_run(item)
+    
+    # Save to BytesIO
+    word_buffer = BytesIO()
+    doc.save(word_buffer)
+    return word_buffer.getvalue()
 
 # Streamlit App
 st.title("🛡️ Section 3: ITN Coverage Analysis")
@@ -396,7 +486,7 @@ st.info("""
 # Load the embedded data files
 try:
     # Load Excel file (embedded)
-    df_original = pd.read_excel("SBD_Final_data_dissemination_7_15_2025.xlsx")
+    df_original = load_excel("SBD_Final_data_dissemination_7_15_2025.xlsx")
     st.success(f"✅ Excel file loaded successfully! Found {len(df_original)} records.")
     
 except Exception as e:
@@ -406,9 +496,13 @@ except Exception as e:
 
 # Load shapefile (embedded)
 try:
-    gdf = gpd.read_file("Chiefdom2021.shp")
+    gdf = load_shapefile("Chiefdom2021.shp")
     st.success(f"✅ Shapefile loaded successfully! Found {len(gdf)} features.")
     
+    # Only the BO and BOMBALI chiefdoms are plotted; drop the rest of the country up front
+    gdf = gdf[gdf['FIRST_DNAM'].isin(['BO', 'BOMBALI'])].reset_index(drop=True)
+    chiefdom_counts = load_district_chiefdom_counts("Chiefdom2021.shp")  # Shapefile chiefdoms per district
+    
 except Exception as e:
     st.error(f"❌ Could not load shapefile: {e}")
     st.info("💡 Make sure 'Chiefdom2021.shp' and supporting files (.dbf, .shx, .prj) are in the same directory as this app")
@@ -468,12 +562,14 @@ if show_itn_details and len(itn_df) > 0:
     
     col1, col2, col3, col4 = st.columns(4)
     
+    overall_totals = compute_itn_aggregates(itn_df)['overall']
+    
     with col1:
-        total_enrollment = int(itn_df["Total_Enrollment"].sum())
+        total_enrollment = int(overall_totals["Total_Enrollment"])
         st.metric("Total Enrollment", f"{total_enrollment:,}")
     
     with col2:
-        total_distributed = int(itn_df["Distributed_ITNs"].sum())
+        total_distributed = int(overall_totals["Distributed_ITNs"])
         st.metric("ITNs Distributed", f"{total_distributed:,}")
     
     with col3:
@@ -484,6 +580,9 @@ if show_itn_details and len(itn_df) > 0:
         schools_with_distribution = len(itn_df[itn_df["Distributed_ITNs"] > 0])
         st.metric("Schools with ITNs", f"{schools_with_distribution:,}")
 
+# Cheap content key for the cached Word reports (the dashboard PNGs are derived from itn_df)
+itn_hash = zlib.adler32(pd.util.hash_pandas_object(itn_df).values) if len(itn_df) > 0 else 0
+
 # Create dashboards
 st.header("🛡️ ITN Coverage Dashboards")
 
@@ -492,104 +591,27 @@ st.subheader("BO District - ITN Coverage")
 
 with st.spinner("Generating BO District ITN coverage dashboard..."):
     try:
-        fig_bo_itn = create_itn_coverage_dashboard(gdf, itn_df, "BO", columns)
-        if fig_bo_itn:
-            st.pyplot(fig_bo_itn)
-            
-            # Save figure option
-            buffer_bo_itn = BytesIO()
-            fig_bo_itn.savefig(buffer_bo_itn, format='png', dpi=300, bbox_inches='tight')
-            buffer_bo_itn.seek(0)
+        png_bo_itn = render_dashboard_png("BO", itn_df, gdf, columns)
+        if png_bo_itn:
+            # The same cached PNG is shown on the page, offered for download and put in Word
+            st.image(png_bo_itn)
             
             st.download_button(
                 label="📥 Download BO District ITN Coverage Dashboard (PNG)",
-                data=buffer_bo_itn,
+                data=png_bo_itn,
                 file_name="BO_District_ITN_Coverage_Dashboard.png",
                 mime="image/png"
             )
             
             # Word Export for BO District
             try:
-                from docx import Document
-                from docx.shared import Inches, Pt
-                from docx.enum.text import WD_ALIGN_PARAGRAPH
-                
-                # Create Word document
-                doc = Document()
-                
-                # Add title
-                title = doc.add_heading('BO District - ITN Coverage Analysis', 0)
-                title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                
-                # Add generation date
-                date_para = doc.add_paragraph()
-                date_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                date_run = date_para.add_run(f"Generated: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                date_run.font.size = Pt(12)
-                
-                doc.add_paragraph()  # Add space
-                
-                # Save matplotlib figure as PNG and embed in Word
-                timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
-                png_filename = f"BO_District_ITN_Coverage_{timestamp}.png"
-                
-                # Save PNG file to current directory
-                fig_bo_itn.savefig(png_filename, format='png', dpi=200, 
-                                  bbox_inches='tight', facecolor='white', 
-                                  edgecolor='none', pad_inches=0.1)
-                
-                # Add the saved PNG to Word document
-                doc.add_picture(png_filename, width=Inches(9.5))  # Fits well in Word page
-                
-                # Add format explanation
-                doc.add_heading('ITN Coverage Format', level=2)
-                format_items = [
-                    "Title: (ITNs Distributed, Total Enrollment)",
-                    "Center: Coverage percentage",
-                    "ITN Calculation: Boys ITNs + Girls ITNs + ITNs Left at School",
-                    "🔴 Red: < 20% coverage",
-                    "🟠 Orange: 20-39% coverage", 
-                    "🟡 Yellow: 40-59% coverage",
-                    "🟢 Light Green: 60-79% coverage",
-                    "🔵 Blue: 80-99% coverage",
-                    "🟣 Purple: 100%+ coverage"
-                ]
-                
-                for item in format_items:
-                    p = doc.add_paragraph()
-                    p.add_run('• ').bold = True
-                    p.add_run(item)
-                
-                # Add summary information
-                doc.add_heading('Dashboard Summary', level=2)
-                
-                bo_data = itn_df[itn_df["District"].str.upper() == "BO"]
-                bo_enrollment = int(bo_data["Total_Enrollment"].sum())
-                bo_distributed = int(bo_data["Distributed_ITNs"].sum())
-                bo_coverage = (bo_distributed / bo_enrollment * 100) if bo_enrollment > 0 else 0
-                
-                summary_text = f"""
-                District: BO
-                Total Chiefdoms: {len(gdf[gdf['FIRST_DNAM'] == 'BO'])}
-                Total Enrollment: {bo_enrollment:,}
-                ITNs Distributed: {bo_distributed:,}
-                ITN Coverage: {bo_coverage:.1f}%
-                PNG File Saved: {png_filename}
-                """
-                
-                for line in summary_text.strip().split('\n'):
-                    if line.strip():
-                        p = doc.add_paragraph()
-                        p.add_run('• ').bold = True
-                        p.add_run(line.strip())
-                
-                # Save to BytesIO
-                word_buffer = BytesIO()
-                doc.save(word_buffer)
-                word_data = word_buffer.getvalue()
+                generated = pd.Timestamp.now()
+                timestamp = generated.strftime('%Y%m%d_%H%M%S')
+                word_data = build_word_report("BO", png_bo_itn, itn_df, itn_hash, chiefdom_counts.get('BO', 0),
+                                              generated.strftime('%Y-%m-%d'))
                 
                 # Success message
-                st.success(f"✅ PNG saved as: {png_filename}")
+                st.success("✅ Word report ready")
                 
                 st.download_button(
                     label="📄 Download BO District ITN Report (Word)",
@@ -614,104 +636,27 @@ st.subheader("BOMBALI District - ITN Coverage")
 
 with st.spinner("Generating BOMBALI District ITN coverage dashboard..."):
     try:
-        fig_bombali_itn = create_itn_coverage_dashboard(gdf, itn_df, "BOMBALI", columns)
-        if fig_bombali_itn:
-            st.pyplot(fig_bombali_itn)
-            
-            # Save figure option
-            buffer_bombali_itn = BytesIO()
-            fig_bombali_itn.savefig(buffer_bombali_itn, format='png', dpi=300, bbox_inches='tight')
-            buffer_bombali_itn.seek(0)
+        png_bombali_itn = render_dashboard_png("BOMBALI", itn_df, gdf, columns)
+        if png_bombali_itn:
+            # The same cached PNG is shown on the page, offered for download and put in Word
+            st.image(png_bombali_itn)
             
             st.download_button(
                 label="📥 Download BOMBALI District ITN Coverage Dashboard (PNG)",
-                data=buffer_bombali_itn,
+                data=png_bombali_itn,
                 file_name="BOMBALI_District_ITN_Coverage_Dashboard.png",
                 mime="image/png"
             )
             
             # Word Export for BOMBALI District
             try:
-                from docx import Document
-                from docx.shared import Inches, Pt
-                from docx.enum.text import WD_ALIGN_PARAGRAPH
-                
-                # Create Word document
-                doc = Document()
-                
-                # Add title
-                title = doc.add_heading('BOMBALI District - ITN Coverage Analysis', 0)
-                title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                
-                # Add generation date
-                date_para = doc.add_paragraph()
-                date_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                date_run = date_para.add_run(f"Generated: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                date_run.font.size = Pt(12)
-                
-                doc.add_paragraph()  # Add space
-                
-                # Save matplotlib figure as PNG and embed in Word
-                timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
-                png_filename = f"BOMBALI_District_ITN_Coverage_{timestamp}.png"
-                
-                # Save PNG file to current directory
-                fig_bombali_itn.savefig(png_filename, format='png', dpi=200, 
-                                       bbox_inches='tight', facecolor='white', 
-                                       edgecolor='none', pad_inches=0.1)
-                
-                # Add the saved PNG to Word document
-                doc.add_picture(png_filename, width=Inches(9.5))  # Fits well in Word page
-                
-                # Add format explanation
-                doc.add_heading('ITN Coverage Format', level=2)
-                format_items = [
-                    "Title: (ITNs Distributed, Total Enrollment)",
-                    "Center: Coverage percentage",
-                    "ITN Calculation: Boys ITNs + Girls ITNs + ITNs Left at School",
-                    "🔴 Red: < 20% coverage",
-                    "🟠 Orange: 20-39% coverage", 
-                    "🟡 Yellow: 40-59% coverage",
-                    "🟢 Light Green: 60-79% coverage",
-                    "🔵 Blue: 80-99% coverage",
-                    "🟣 Purple: 100%+ coverage"
-                ]
-                
-                for item in format_items:
-                    p = doc.add_paragraph()
-                    p.add_run('• ').bold = True
-                    p.add_run(item)
-                
-                # Add summary information
-                doc.add_heading('Dashboard Summary', level=2)
-                
-                bombali_data = itn_df[itn_df["District"].str.upper() == "BOMBALI"]
-                bombali_enrollment = int(bombali_data["Total_Enrollment"].sum())
-                bombali_distributed = int(bombali_data["Distributed_ITNs"].sum())
-                bombali_coverage = (bombali_distributed / bombali_enrollment * 100) if bombali_enrollment > 0 else 0
-                
-                summary_text = f"""
-                District: BOMBALI
-                Total Chiefdoms: {len(gdf[gdf['FIRST_DNAM'] == 'BOMBALI'])}
-                Total Enrollment: {bombali_enrollment:,}
-                ITNs Distributed: {bombali_distributed:,}
-                ITN Coverage: {bombali_coverage:.1f}%
-                PNG File Saved: {png_filename}
-                """
-                
-                for line in summary_text.strip().split('\n'):
-                    if line.strip():
-                        p = doc.add_paragraph()
-                        p.add_run('• ').bold = True
-                        p.add_run(line.strip())
-                
-                # Save to BytesIO
-                word_buffer = BytesIO()
-                doc.save(word_buffer)
-                word_data = word_buffer.getvalue()
+                generated = pd.Timestamp.now()
+                timestamp = generated.strftime('%Y%m%d_%H%M%S')
+                word_data = build_word_report("BOMBALI", png_bombali_itn, itn_df, itn_hash, chiefdom_counts.get('BOMBALI', 0),
+                                              generated.strftime('%Y-%m-%d'))
                 
                 # Success message
-                st.success(f"✅ PNG saved as: {png_filename}")
+                st.success("✅ Word report ready")
                 
                 st.download_button(
                     label="📄 Download BOMBALI District ITN Report (Word)",
@@ -732,7 +677,13 @@ with st.spinner("Generating BOMBALI District ITN coverage dashboard..."):
 # Export All Dashboards as Combined Word Document
 st.header("📄 Combined Word Export")
 
-if st.button("📋 Generate Combined ITN Report", help="Generate a comprehensive Word document with both districts"):
+# Nothing to embed unless at least one district dashboard was rendered above
+dashboards_ready = bool(('png_bo_itn' in locals() and png_bo_itn) or ('png_bombali_itn' in locals() and png_bombali_itn))
+if not dashboards_ready:
+    st.info("💡 The combined report becomes available once a district dashboard has been generated")
+
+if st.button("📋 Generate Combined ITN Report", help="Generate a comprehensive Word document with both districts",
+             disabled=not dashboards_ready):
     try:
         from docx import Document
         from docx.shared import Inches, Pt
@@ -740,6 +691,7 @@ if st.button("📋 Generate Combined ITN Report", help="Generate a comprehensive
         
         # Create Word document
         doc = Document()
+        timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
         
         # Add main title
         title = doc.add_heading('School-Based Distribution (SBD)', 0)
@@ -781,77 +733,58 @@ if st.button("📋 Generate Combined ITN Report", help="Generate a comprehensive
         # Executive Summary
         doc.add_heading('Executive Summary', level=1)
         
-        total_enrollment = int(itn_df["Total_Enrollment"].sum())
-        total_distributed = int(itn_df["Distributed_ITNs"].sum())
-        overall_coverage = (total_distributed / total_enrollment * 100) if total_enrollment > 0 else 0
+        aggregates = compute_itn_aggregates(itn_df)
+        by_district = aggregates['by_district']
         
-        bo_data = itn_df[itn_df["District"].str.upper() == "BO"]
-        bombali_data = itn_df[itn_df["District"].str.upper() == "BOMBALI"]
+        total_enrollment = int(aggregates['overall']["Total_Enrollment"])
+        total_distributed = int(aggregates['overall']["Distributed_ITNs"])
+        overall_coverage = (total_distributed / total_enrollment * 100) if total_enrollment > 0 else 0
         
-        bo_enrollment = int(bo_data["Total_Enrollment"].sum())
-        bo_distributed = int(bo_data["Distributed_ITNs"].sum())
+        bo_enrollment = int(by_district.at["BO", "Total_Enrollment"])
+        bo_distributed = int(by_district.at["BO", "Distributed_ITNs"])
         bo_coverage = (bo_distributed / bo_enrollment * 100) if bo_enrollment > 0 else 0
         
-        bombali_enrollment = int(bombali_data["Total_Enrollment"].sum())
-        bombali_distributed = int(bombali_data["Distributed_ITNs"].sum())
+        bombali_enrollment = int(by_district.at["BOMBALI", "Total_Enrollment"])
+        bombali_distributed = int(by_district.at["BOMBALI", "Distributed_ITNs"])
         bombali_coverage = (bombali_distributed / bombali_enrollment * 100) if bombali_enrollment > 0 else 0
         
-        summary_text = f"""
-        This comprehensive dashboard report presents ITN distribution effectiveness analysis for BO and BOMBALI districts:
-        
-        • Districts Covered: BO, BOMBALI
-        • Total Student Enrollment: {total_enrollment:,}
-        • Total ITNs Distributed: {total_distributed:,}
-        • Overall ITN Coverage: {overall_coverage:.1f}%
-        • BO District Coverage: {bo_coverage:.1f}%
-        • BOMBALI District Coverage: {bombali_coverage:.1f}%
-        
-        Coverage is calculated as: (ITNs Distributed / Total Enrollment) × 100%
-        
-        Formulas:
-        • ITN Distributed = Boys ITNs + Girls ITNs + ITNs Left at School
-        • Total Enrollment = Sum of all pupils enrolled in Classes 1-5
-        • Coverage = (ITNs Distributed / Total Enrollment) × 100%
-        
-        Color coding helps identify areas requiring attention and those performing well.
-        Format shows (ITNs Distributed, Total Enrollment) with coverage percentage in center.
-        """
+        summary_lines = [
+            "This comprehensive dashboard report presents ITN distribution effectiveness analysis for BO and BOMBALI districts:",
+            "• Districts Covered: BO, BOMBALI",
+            f"• Total Student Enrollment: {total_enrollment:,}",
+            f"• Total ITNs Distributed: {total_distributed:,}",
+            f"• Overall ITN Coverage: {overall_coverage:.1f}%",
+            f"• BO District Coverage: {bo_coverage:.1f}%",
+            f"• BOMBALI District Coverage: {bombali_coverage:.1f}%",
+            "Coverage is calculated as: (ITNs Distributed / Total Enrollment) × 100%",
+            "Formulas:",
+            "• ITN Distributed = Boys ITNs + Girls ITNs + ITNs Left at School",
+            "• Total Enrollment = Sum of all pupils enrolled in Classes 1-5",
+            "• Coverage = (ITNs Distributed / Total Enrollment) × 100%",
+            "Color coding helps identify areas requiring attention and those performing well.",
+            "Format shows (ITNs Distributed, Total Enrollment) with coverage percentage in center."
+        ]
         
-        for line in summary_text.strip().split('\n'):
-            if line.strip():
-                if line.startswith('•'):
-                    p = doc.add_paragraph()
-                    p.add_run(line.strip())
-                else:
-                    doc.add_paragraph(line.strip())
+        for line in summary_lines:
+            doc.add_paragraph(line)
         
         doc.add_page_break()
         
         # BO District section
-        if 'fig_bo_itn' in locals():
+        if 'png_bo_itn' in locals() and png_bo_itn:
             doc.add_heading('BO District - ITN Coverage Analysis', level=1)
             
-            # Save BO figure as PNG and embed in Word
-            timestamp = pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')
-            bo_png_filename = f"BO_District_ITN_Combined_{timestamp}.png"
-            
-            # Save PNG file to current directory
-            fig_bo_itn.savefig(bo_png_filename, format='png', dpi=200, 
-                              bbox_inches='tight', facecolor='white', 
-                              edgecolor='none', pad_inches=0.1)
-            
-            # Add the saved PNG to Word document
-            doc.add_picture(bo_png_filename, width=Inches(9.5))  # Fits well in Word page
+            # Embed the rendered BO PNG bytes straight from memory
+            doc.add_picture(BytesIO(png_bo_itn), width=Inches(9.5))  # Fits well in Word page
             
             # BO summary
             doc.add_heading('BO District Summary', level=2)
             
             bo_summary_items = [
-                f"Total Chiefdoms: {len(gdf[gdf['FIRST_DNAM'] == 'BO'])}",
+                f"Total Chiefdoms: {chiefdom_counts.get('BO', 0)}",
                 f"Total Enrollment: {bo_enrollment:,}",
                 f"ITNs Distributed: {bo_distributed:,}",
-                f"ITN Coverage: {bo_coverage:.1f}%",
-                f"PNG File Saved: {bo_png_filename}"
+                f"ITN Coverage: {bo_coverage:.1f}%"
             ]
             
             for item in bo_summary_items:
@@ -862,29 +795,20 @@ if st.button("📋 Generate Combined ITN Report", help="Generate a comprehensive
             doc.add_page_break()
         
         # BOMBALI District section
-        if 'fig_bombali_itn' in locals():
+        if 'png_bombali_itn' in locals() and png_bombali_itn:
             doc.add_heading('BOMBALI District - ITN Coverage Analysis', level=1)
             
-            # Save BOMBALI figure as PNG and embed in Word
-            bombali_png_filename = f"BOMBALI_District_ITN_Combined_{timestamp}.png"
-            
-            # Save PNG file to current directory
-            fig_bombali_itn.savefig(bombali_png_filename, format='png', dpi=200, 
-                                   bbox_inches='tight', facecolor='white', 
-                                   edgecolor='none', pad_inches=0.1)
-            
-            # Add the saved PNG to Word document
-            doc.add_picture(bombali_png_filename, width=Inches(9.5))  # Fits well in Word page
+            # Embed the rendered BOMBALI PNG bytes straight from memory
+            doc.add_picture(BytesIO(png_bombali_itn), width=Inches(9.5))  # Fits well in Word page
             
             # BOMBALI summary
             doc.add_heading('BOMBALI District Summary', level=2)
             
             bombali_summary_items = [
-                f"Total Chiefdoms: {len(gdf[gdf['FIRST_DNAM'] == 'BOMBALI'])}",
+                f"Total Chiefdoms: {chiefdom_counts.get('BOMBALI', 0)}",
                 f"Total Enrollment: {bombali_enrollment:,}",
                 f"ITNs Distributed: {bombali_distributed:,}",
-                f"ITN Coverage: {bombali_coverage:.1f}%",
-                f"PNG File Saved: {bombali_png_filename}"
+                f"ITN Coverage: {bombali_coverage:.1f}%"
             ]
             
             for item in bombali_summary_items:
@@ -897,8 +821,8 @@ if st.button("📋 Generate Combined ITN Report", help="Generate a comprehensive
         doc.save(word_buffer)
         word_data = word_buffer.getvalue()
         
-        # Success message showing saved PNG files
-        st.success(f"✅ PNG files saved: {bo_png_filename}, {bombali_png_filename}")
+        # Success message
+        st.success("✅ Combined Word report ready")
         
         st.download_button(
             label="💾 Download Combined ITN Analysis Report (Word)",
@@ -917,49 +841,39 @@ if st.button("📋 Generate Combined ITN Report", help="Generate a comprehensive
 st.header("📈 ITN Distribution Analysis")
 
 if len(itn_df) > 0:
-    # Calculate ITN statistics
-    bo_data = itn_df[itn_df["District"].str.upper() == "BO"]
-    bombali_data = itn_df[itn_df["District"].str.upper() == "BOMBALI"]
+    # Calculate ITN statistics (cached; shared by the metrics and the detailed table)
+    aggregates = compute_itn_aggregates(itn_df)
+    by_district = aggregates['by_district']
+    chiefdom_coverage = aggregates['by_chiefdom']
+    enrollment = chiefdom_coverage["Total_Enrollment"].to_numpy(dtype=np.int64)
+    distributed = chiefdom_coverage["Distributed_ITNs"].to_numpy(dtype=np.int64)
+    coverage = np.divide(distributed, enrollment, out=np.zeros(len(enrollment)), where=enrollment > 0) * 100
     
     # ITN metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        bo_enrollment = int(bo_data["Total_Enrollment"].sum())
-        bo_distributed = int(bo_data["Distributed_ITNs"].sum())
+        bo_enrollment = int(by_district.at["BO", "Total_Enrollment"])
+        bo_distributed = int(by_district.at["BO", "Distributed_ITNs"])
         bo_coverage = (bo_distributed / bo_enrollment * 100) if bo_enrollment > 0 else 0
         st.metric("BO District ITN Coverage", f"{bo_coverage:.1f}%", f"{bo_distributed}/{bo_enrollment}")
     
     with col2:
-        bombali_enrollment = int(bombali_data["Total_Enrollment"].sum())
-        bombali_distributed = int(bombali_data["Distributed_ITNs"].sum())
+        bombali_enrollment = int(by_district.at["BOMBALI", "Total_Enrollment"])
+        bombali_distributed = int(by_district.at["BOMBALI", "Distributed_ITNs"])
         bombali_coverage = (bombali_distributed / bombali_enrollment * 100) if bombali_enrollment > 0 else 0
         st.metric("BOMBALI District ITN Coverage", f"{bombali_coverage:.1f}%", f"{bombali_distributed}/{bombali_enrollment}")
     
     with col3:
-        total_enrollment = int(itn_df["Total_Enrollment"].sum())
-        total_distributed = int(itn_df["Distributed_ITNs"].sum())
+        total_enrollment = int(aggregates['overall']["Total_Enrollment"])
+        total_distributed = int(aggregates['overall']["Distributed_ITNs"])
         overall_coverage = (total_distributed / total_enrollment * 100) if total_enrollment > 0 else 0
         st.metric("Overall ITN Coverage", f"{overall_coverage:.1f}%", f"{total_distributed}/{total_enrollment}")
     
     with col4:
         # Calculate chiefdoms with good ITN coverage (>= 60%)
-        good_itn_coverage_count = 0
-        total_chiefdoms = 0
-        
-        for district in ["BO", "BOMBALI"]:
-            district_data = itn_df[itn_df["District"].str.upper() == district.upper()]
-            chiefdoms = district_data['Chiefdom'].dropna().unique()
-            
-            for chiefdom in chiefdoms:
-                chiefdom_data = district_data[district_data['Chiefdom'] == chiefdom]
-                enrollment = int(chiefdom_data["Total_Enrollment"].sum())
-                distributed = int(chiefdom_data["Distributed_ITNs"].sum())
-                coverage = (distributed / enrollment * 100) if enrollment > 0 else 0
-                
-                if coverage >= 60:
-                    good_itn_coverage_count += 1
-                total_chiefdoms += 1
+        good_itn_coverage_count = int((coverage >= 60).sum())
+        total_chiefdoms = len(chiefdom_coverage)
         
         good_itn_coverage_percent = (good_itn_coverage_count / total_chiefdoms * 100) if total_chiefdoms > 0 else 0
         st.metric("Chiefdoms with Good ITN Coverage", f"{good_itn_coverage_percent:.0f}%", f"{good_itn_coverage_count}/{total_chiefdoms}")
@@ -967,56 +881,27 @@ if len(itn_df) > 0:
     # Detailed ITN coverage table
     st.subheader("📋 Detailed ITN Coverage by Chiefdom")
     
-    detailed_itn_coverage = []
-    for district in ["BO", "BOMBALI"]:
-        district_data = itn_df[itn_df["District"].str.upper() == district.upper()]
-        chiefdoms = sorted(district_data['Chiefdom'].dropna().unique())
-        
-        for chiefdom in chiefdoms:
-            chiefdom_data = district_data[district_data['Chiefdom'] == chiefdom]
-            enrollment = int(chiefdom_data["Total_Enrollment"].sum())
-            distributed = int(chiefdom_data["Distributed_ITNs"].sum())
-            coverage = (distributed / enrollment * 100) if enrollment > 0 else 0
-            
-            # Determine status
-            if coverage >= 80:
-                status = "✅ Excellent"
-            elif coverage >= 60:
-                status = "🟢 Good"
-            elif coverage >= 40:
-                status = "🟡 Fair"
-            elif coverage >= 20:
-                status = "🟠 Poor"
-            else:
-                status = "🔴 Critical"
-            
-            detailed_itn_coverage.append({
-                'District': district,
-                'Chiefdom': chiefdom,
-                'Total Enrollment': enrollment,
-                'ITNs Distributed': distributed,
-                'Coverage %': f"{coverage:.1f}%",
-                'Status': status
-            })
-    
-    itn_coverage_df = pd.DataFrame(detailed_itn_coverage)
+    itn_coverage_df = with_arrow_strings(pd.DataFrame({
+        'District': chiefdom_coverage.index.get_level_values("District_upper").astype(str),
+        'Chiefdom': chiefdom_coverage.index.get_level_values("Chiefdom").astype(str),
+        'Total Enrollment': enrollment,
+        'ITNs Distributed': distributed,
+        'Coverage %': np.char.mod("%.1f%%", coverage),
+        'Status': get_coverage_statuses(coverage)
+    }))
     st.dataframe(itn_coverage_df, use_container_width=True)
     
     # Distribution Summary
     st.subheader("📊 Distribution Summary")
     
     try:
-        summary_data = generate_simple_summary(itn_df)
-        summary_df = pd.DataFrame(summary_data)
+        summary_df = generate_simple_summary(itn_df)
         
         st.dataframe(summary_df, use_container_width=True)
     
     except Exception as e:
         st.error(f"Error generating distribution summary: {e}")
 
-# Memory optimization - close matplotlib figures
-plt.close('all')
-
 # Footer
 st.markdown("---")
 st.markdown("**🛡️ Section 3: ITN Coverage Analysis | School-Based Distribution Analysis**")